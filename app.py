@@ -10,13 +10,17 @@ import json
 from dotenv import load_dotenv
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from config.settings import settings
 from utils.llm_manager import LLMManager
 from utils.document_loader import DocumentLoader
-from utils.vector_store_manager import VectorStoreManager
+from utils.ingestion_cache import IngestionCache
+from utils.ingest import ingest_file
+from utils.warmup import Warmup
+from utils.semantic_cache import SemanticAnswerCache
 from flows.qa_flow import QAFlow
 from flows.mcq_flow import MCQFlow
 from flows.summary_flow import SummaryFlow
@@ -110,6 +114,7 @@ def init_session_state():
         st.session_state.chat_history = []
         st.session_state.uploaded_files = []
         st.session_state.current_documents = []
+        st.session_state.num_chunks = 0
         st.session_state.vector_manager = None
         st.session_state.agents_ready = False
         st.session_state.mcq_questions = []
@@ -117,43 +122,75 @@ def init_session_state():
         st.session_state.mcq_sources = []
 
 
-def initialize_system():
-    """Initialize LLM and agents"""
+@st.cache_resource
+def get_warmup() -> Warmup:
+    """Start the background warm-up once per process"""
+    return Warmup().start()
+
+
+@st.cache_resource
+def get_answer_cache(_embeddings) -> Optional[SemanticAnswerCache]:
+    """Semantic answer cache shared by all sessions of the process"""
+    if not settings.semantic_cache_enabled:
+        return None
+    return SemanticAnswerCache(_embeddings)
+
+
+def initialize_system(warmup: Warmup):
+    """Attach the warmed-up vector store and build the agents"""
     try:
-        with st.spinner("Initializing AI system..."):
-            # Test LLM connection
-            if not LLMManager.test_connection():
-                st.error("Failed to connect to Ollama. Please ensure Ollama is running.")
-                st.info("Run: `ollama serve` in a terminal")
-                return False
-            
-            # Initialize embeddings
-            embeddings = LLMManager.get_embeddings()
-            
-            # Initialize vector store manager
-            if st.session_state.vector_manager is None:
-                st.session_state.vector_manager = VectorStoreManager(embeddings)
-                st.session_state.vector_manager.load_vector_store()
-            
-            # Initialize agents
-            if not st.session_state.agents_ready:
-                st.session_state.qa_agent = QAFlow(st.session_state.vector_manager)
-                st.session_state.qa_agent.plot("QAFlow")
-                st.session_state.summary_agent = SummaryFlow()
-                st.session_state.summary_agent.plot("SummaryFLow")
-                st.session_state.mcq_agent = MCQFlow()
-                st.session_state.mcq_agent.plot("MCQFlow")
-                st.session_state.agents_ready = True
-            
-            st.session_state.initialized = True
-            return True
-            
+        st.session_state.vector_manager = warmup.vector_manager
+
+        # Initialize agents
+        if not st.session_state.agents_ready:
+            st.session_state.qa_agent = QAFlow(
+                st.session_state.vector_manager,
+                answer_cache=get_answer_cache(st.session_state.vector_manager.embeddings)
+            )
+            st.session_state.qa_agent.plot("QAFlow")
+            st.session_state.summary_agent = SummaryFlow()
+            st.session_state.summary_agent.plot("SummaryFLow")
+            st.session_state.mcq_agent = MCQFlow()
+            st.session_state.mcq_agent.plot("MCQFlow")
+            st.session_state.agents_ready = True
+
+        st.session_state.initialized = True
+        return True
+
     except Exception as e:
         st.error(f"Initialization error: {str(e)}")
         logger.error(f"Initialization error: {e}")
         return False
 
 
+WARMUP_LABELS = {
+    "llm": "LLM",
+    "embeddings": "Embedding model",
+    "vector_store": "Vector store",
+}
+
+
+@st.fragment(run_every=1)
+def show_warmup_status(warmup: Warmup):
+    """Per-component warm-up status, refreshed until everything has finished"""
+    for name, info in warmup.report().items():
+        label = WARMUP_LABELS[name]
+        if info["status"] == "ready":
+            st.success(f"✅ {label} ready ({info['seconds']:.1f}s)")
+            if info["error"]:
+                st.warning(f"⚠️ {info['error']}. Use 'Clear All Data' to remove the saved files.")
+        elif info["status"] == "failed":
+            st.error(f"❌ {label} failed: {info['error']}")
+            if name == "llm":
+                st.info("Run: `ollama serve` in a terminal")
+        else:
+            st.info(f"⏳ {label} loading...")
+
+    # Reload the whole page once queries can run or the warm-up has finished
+    if not st.session_state.initialized and (warmup.queries_ready() or warmup.is_done()):
+        st.rerun(scope="app")
+
+
 def save_chat_history():
     """Save chat history to file"""
     try:
@@ -176,47 +213,66 @@ def load_chat_history():
 
 
 def process_uploaded_files(uploaded_files):
-    """Process uploaded files and create vector store"""
+    """Process uploaded files and stream their chunks into the vector store"""
     try:
         doc_loader = DocumentLoader()
-        all_documents = []
+        ingestion_cache = IngestionCache()
+        preview_documents = []
+        num_chunks = 0
         
         progress_bar = st.progress(0)
         status_text = st.empty()
         
-        for idx, uploaded_file in enumerate(uploaded_files):
-            status_text.text(f"Processing {uploaded_file.name}...")
-            
-            # Save file
-            file_path = os.path.join(settings.upload_dir, uploaded_file.name)
-            with open(file_path, 'wb') as f:
-                f.write(uploaded_file.getbuffer())
-            
-            # Load and process
-            documents = doc_loader.load_file(file_path)
-            all_documents.extend(documents)
-            
-            progress_bar.progress((idx + 1) / len(uploaded_files))
-        
-        status_text.text("Creating vector embeddings...")
-        
-        # Add to vector store
-        st.session_state.vector_manager.add_documents(all_documents)
-        st.session_state.vector_manager.save_vector_store()
+        # The vector store is shared by all sessions: one upload at a time, queries carry on
+        with get_warmup().ingest_lock:
+            for idx, uploaded_file in enumerate(uploaded_files):
+                status_text.text(f"Processing {uploaded_file.name}...")
+                
+                # Save file
+                file_path = os.path.join(settings.upload_dir, uploaded_file.name)
+                with open(file_path, 'wb') as f:
+                    f.write(uploaded_file.getbuffer())
+                
+                num_chunks += ingest_file(
+                    st.session_state.vector_manager, doc_loader, ingestion_cache, file_path, preview_documents
+                )
+                # Saved file by file, so unsaved vectors never pile up over the whole batch
+                status_text.text(f"Saving {uploaded_file.name}...")
+                st.session_state.vector_manager.save_vector_store()
+                
+                progress_bar.progress((idx + 1) / len(uploaded_files))
         
-        st.session_state.current_documents = all_documents
+        st.session_state.current_documents = preview_documents
+        st.session_state.num_chunks = num_chunks
         st.session_state.documents_loaded = True
         st.session_state.uploaded_files = [f.name for f in uploaded_files]
         
         progress_bar.empty()
         status_text.empty()
         
-        return True, len(all_documents)
+        return True, num_chunks
         
     except Exception as e:
         logger.error(f"Error processing files: {e}")
         return False, str(e)
-    
+
+
+def stream_qa_answer(question):
+    """Render the answer as its tokens arrive, then return the full QA result"""
+    qa_agent = st.session_state.qa_agent
+    try:
+        st.markdown('<div class="success-box">', unsafe_allow_html=True)
+        st.markdown("**Answer:**")
+        st.write_stream(qa_agent.stream(question))
+        st.markdown('</div>', unsafe_allow_html=True)
+    except Exception as e:
+        logger.error(f"Error streaming answer: {e}")
+        return {"success": False, "answer": f"Error generating the answer: {str(e)}", "sources": []}
+
+    with st.spinner("🏷️ Extracting keywords..."):
+        return qa_agent.finish_stream()
+
+
 def deduplicate_dicts(dicts_list):
     seen = set()
     unique_dicts = []
@@ -234,6 +290,11 @@ def main():
     
     # Initialize session state
     init_session_state()
+
+    # Components load in the background; queries can start once the index and embedder are ready
+    warmup = get_warmup()
+    if not st.session_state.initialized and warmup.queries_ready():
+        initialize_system(warmup)
     
     # Header
     st.markdown('<div class="main-header">📊 Financial Document Analyzer</div>', unsafe_allow_html=True)
@@ -248,18 +309,32 @@ def main():
         st.markdown("---")
         st.subheader("System Status")
         
-        if not st.session_state.initialized:
-            if st.button("🚀 Initialize System", type="primary"):
-                if initialize_system():
-                    st.success("✅ System initialized!")
-                    st.rerun()
+        if not warmup.is_done():
+            show_warmup_status(warmup)
         else:
+            for name, info in warmup.report().items():
+                if info["status"] == "failed":
+                    st.error(f"❌ {WARMUP_LABELS[name]} failed: {info['error']}")
+                elif info["error"]:
+                    st.warning(f"⚠️ {info['error']}. Use 'Clear All Data' to remove the saved files.")
+            if warmup.status["llm"] == "failed":
+                st.info("Run: `ollama serve` in a terminal")
+
+        if st.session_state.initialized:
             st.success("✅ System Online")
             st.info(f"📁 Model: {settings.ollama_model}")
+
+            llm_cache = LLMManager.get_llm_cache()
+            if llm_cache is not None:
+                cache_stats = llm_cache.stats()
+                st.caption(
+                    f"LLM cache: {cache_stats['hit_rate']:.0%} hit rate, "
+                    f"{cache_stats['entries']} responses, {cache_stats['saved_seconds']:.0f}s saved"
+                )
             
             if st.session_state.documents_loaded:
                 st.success(f"✅ {len(st.session_state.uploaded_files)} files loaded")
-                st.success(f"✅ {len(st.session_state.current_documents)} chunks indexed")
+                st.success(f"✅ {st.session_state.num_chunks} chunks indexed")
         
         # File upload
         st.markdown("---")
@@ -274,7 +349,7 @@ def main():
         
         if uploaded_files and st.button("Process Files", type="primary"):
             if not st.session_state.initialized:
-                st.warning("Please initialize the system first!")
+                st.warning("The system is still warming up, please wait!")
             else:
                 success, result = process_uploaded_files(uploaded_files)
                 if success:
@@ -287,10 +362,14 @@ def main():
         st.markdown("---")
         if st.button("🗑️ Clear All Data"):
             if st.session_state.vector_manager:
-                st.session_state.vector_manager.clear_vector_store()
+                with get_warmup().ingest_lock:
+                    st.session_state.vector_manager.clear_vector_store()
+                # An unreadable saved store is gone with the rest
+                get_warmup().errors.pop("vector_store", None)
             st.session_state.documents_loaded = False
             st.session_state.uploaded_files = []
             st.session_state.current_documents = []
+            st.session_state.num_chunks = 0
             st.session_state.chat_history = []
             st.success("Data cleared!")
             st.rerun()
@@ -298,7 +377,7 @@ def main():
     # Main content
     if not st.session_state.initialized:
         st.markdown('<div class="info-box">', unsafe_allow_html=True)
-        st.info("👈 Click 'Initialize System' in the sidebar to get started!")
+        st.info("👈 The system is warming up, see its status in the sidebar.")
         st.markdown('</div>', unsafe_allow_html=True)
         
         # Show system requirements
@@ -353,48 +432,51 @@ def main():
                 ask_button = st.button("🔍 Ask Question", type="primary")
             
             if ask_button and question:
-                with st.spinner("🤔 Analyzing documents..."):
-                    result = st.session_state.qa_agent.kickoff(inputs={"question": question})
-                    
-                    if result['success']:
+                if settings.qa_stream_answers:
+                    result = stream_qa_answer(question)
+                else:
+                    with st.spinner("🤔 Analyzing documents..."):
+                        result = st.session_state.qa_agent.kickoff(inputs={"question": question})
+                
+                if result['success']:
+                    if not settings.qa_stream_answers:
                         st.markdown('<div class="success-box">', unsafe_allow_html=True)
                         st.markdown("**Answer:**")
                         st.write(result['answer'])
                         st.markdown('</div>', unsafe_allow_html=True)
-                        
 
-                        keywords = result.get("keywords", "")
-                        if keywords:
-                            keywords_arr = [kw.strip() for kw in keywords.split(',')]
-                            st.markdown("**Keywords:**")
-                            st.markdown(
-                                " ".join([f'<span style="background-color:#e0e0e0; padding:4px 8px; margin:2px; border-radius:5px; display:inline-block;">{kw}</span>' for kw in keywords_arr]),
-                                unsafe_allow_html=True
-                            )
-                        else:
-                            st.markdown("_No keywords found._")
-
-                        # Show sources
-                        with st.expander("📚 View Sources"):
-                            original_sources = result['sources']
-                            clean_sources = deduplicate_dicts(original_sources)
-
-                            for idx, source in enumerate(clean_sources, 1):
-                                st.markdown(f"**Source {idx}:** {source['source']} (Type: {source['type']})")
-                                if 'page' in source:
-                                    st.markdown(f"- Page: {source['page']}")
-                        
-                        # Add to chat history
-                        st.session_state.chat_history.append({
-                            "timestamp": datetime.now().isoformat(),
-                            "type": "qa",
-                            "question": question,
-                            "answer": result['answer'],
-                            "sources": result['sources']
-                        })
-                        save_chat_history()
+                    keywords = result.get("keywords", "")
+                    if keywords:
+                        keywords_arr = [kw.strip() for kw in keywords.split(',')]
+                        st.markdown("**Keywords:**")
+                        st.markdown(
+                            " ".join([f'<span style="background-color:#e0e0e0; padding:4px 8px; margin:2px; border-radius:5px; display:inline-block;">{kw}</span>' for kw in keywords_arr]),
+                            unsafe_allow_html=True
+                        )
                     else:
-                        st.error(f"❌ {result['answer']}")
+                        st.markdown("_No keywords found._")
+
+                    # Show sources
+                    with st.expander("📚 View Sources"):
+                        original_sources = result['sources']
+                        clean_sources = deduplicate_dicts(original_sources)
+
+                        for idx, source in enumerate(clean_sources, 1):
+                            st.markdown(f"**Source {idx}:** {source['source']} (Type: {source['type']})")
+                            if 'page' in source:
+                                st.markdown(f"- Page: {source['page']}")
+                    
+                    # Add to chat history
+                    st.session_state.chat_history.append({
+                        "timestamp": datetime.now().isoformat(),
+                        "type": "qa",
+                        "question": question,
+                        "answer": result['answer'],
+                        "sources": result['sources']
+                    })
+                    save_chat_history()
+                else:
+                    st.error(f"❌ {result['answer']}")
     
     # Tab 2: Summary Agent
     with tab2:
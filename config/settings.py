@@ -13,6 +13,45 @@ class Settings(BaseSettings):
     # Model -> "Gemma2 2B is a lightweight decoder-only transformer language model with 2 billion parameters, optimized for efficiency and capable of handling context windows up to 8K tokens.”
     ollama_model: str = Field(default="gemma2:2b", env="OLLAMA_MODEL")
 
+    # Seconds to wait for an Ollama response (generation on CPU can take minutes)
+    ollama_timeout: float = Field(default=600, env="OLLAMA_TIMEOUT")
+
+    # Seconds to wait for a connection to Ollama
+    ollama_connect_timeout: float = Field(default=5, env="OLLAMA_CONNECT_TIMEOUT")
+
+    # Size of the keep-alive connection pool to Ollama shared by the crews
+    ollama_max_connections: int = Field(default=10, env="OLLAMA_MAX_CONNECTIONS")
+
+    # Sentence-transformers model used to embed chunks and queries
+    embedding_model: str = Field(default="sentence-transformers/all-MiniLM-L6-v2", env="EMBEDDING_MODEL")
+
+    # Embedding execution backend: "torch", "onnx" or "onnx-int8" (quantized ONNX, both need optimum[onnxruntime])
+    embedding_backend: str = Field(default="torch", env="EMBEDDING_BACKEND")
+
+    # Quantized ONNX file used by "onnx-int8", pick the one matching the CPU (avx2, avx512, avx512_vnni, arm64)
+    embedding_onnx_int8_file: str = Field(default="onnx/model_quint8_avx2.onnx", env="EMBEDDING_ONNX_INT8_FILE")
+
+    # Number of chunks per forward pass of the embedding model
+    embedding_batch_size: int = Field(default=64, env="EMBEDDING_BATCH_SIZE")
+
+    # CPU threads used by the embedding model (0 keeps the library default)
+    embedding_threads: int = Field(default=0, env="EMBEDDING_THREADS")
+
+    # Persist chunk embeddings on disk (under processed_dir) so identical text is embedded only once
+    embedding_cache_enabled: bool = Field(default=True, env="EMBEDDING_CACHE_ENABLED")
+
+    # Size cap of the embedding cache in megabytes, least recently used entries are evicted beyond it
+    embedding_cache_max_mb: int = Field(default=512, env="EMBEDDING_CACHE_MAX_MB")
+
+    # Persist crew LLM responses on disk (under processed_dir) so identical prompts are answered from cache
+    llm_cache_enabled: bool = Field(default=True, env="LLM_CACHE_ENABLED")
+
+    # Size cap of the LLM response cache in megabytes, least recently used entries are evicted beyond it
+    llm_cache_max_mb: int = Field(default=64, env="LLM_CACHE_MAX_MB")
+
+    # Cached LLM responses older than this (in hours) are generated again
+    llm_cache_ttl_hours: float = Field(default=168, env="LLM_CACHE_TTL_HOURS")
+
     # -- LangSmith Configuration --
 
     # Debug, test, evaluate, and monitor chains and intelligent agents
@@ -31,9 +70,123 @@ class Settings(BaseSettings):
     # Specifies how many characters overlap between chunks to preserve context continuity
     chunk_overlap: int = Field(default=200, env="CHUNK_SIZE")
 
+    # Number of worker processes used to extract PDF pages in parallel (at most one per CPU)
+    pdf_extraction_workers: int = Field(default=4, env="PDF_EXTRACTION_WORKERS")
+
+    # PDFs with fewer pages than this are extracted serially (pool startup would cost more than it saves)
+    pdf_parallel_min_pages: int = Field(default=50, env="PDF_PARALLEL_MIN_PAGES")
+
+    # CSV files at least this large (in megabytes) are read in chunks instead of all at once
+    csv_chunked_min_mb: int = Field(default=50, env="CSV_CHUNKED_MIN_MB")
+
+    # Number of rows read per chunk when a CSV file is read in chunks
+    csv_read_chunksize: int = Field(default=10000, env="CSV_READ_CHUNKSIZE")
+
+    # Layout of CSV rows in chunk text: "csv" or "pipe" (header once, no padding) or "table" (aligned columns)
+    csv_serialization: str = Field(default="csv", env="CSV_SERIALIZATION")
+
+    # Number of CSV rows per row-chunk document
+    csv_rows_per_chunk: int = Field(default=50, env="CSV_ROWS_PER_CHUNK")
+
+    # Number of chunks embedded and added to the vector store per batch during ingestion
+    ingest_batch_size: int = Field(default=64, env="INGEST_BATCH_SIZE")
+
+    # Maximum number of chunk batches parsed ahead of the embedder (parsing blocks beyond this)
+    ingest_queue_batches: int = Field(default=4, env="INGEST_QUEUE_BATCHES")
+
     # Local directory path where the vector store (e.g., embeddings database) will be saved
     vector_store_path: str = Field(default="./data/vector_store", env="VECTOR_STORE_PATH")
 
+    # Save only the vectors added since the last save, as append-only segments next to the base index
+    vector_store_incremental: bool = Field(default=True, env="VECTOR_STORE_INCREMENTAL")
+
+    # Number of segments after which they are merged into the base index in the background
+    vector_store_compact_segments: int = Field(default=20, env="VECTOR_STORE_COMPACT_SEGMENTS")
+
+    # Unsaved vectors after which a segment is written while a file is still being added
+    vector_store_flush_vectors: int = Field(default=10000, env="VECTOR_STORE_FLUSH_VECTORS")
+
+    # FAISS index type: "auto" (exact flat search, promoted to vector_index_ann_type past the threshold), "flat", "ivf" or "hnsw"
+    vector_index_type: str = Field(default="auto", env="VECTOR_INDEX_TYPE")
+
+    # Approximate index that "auto" promotes to: "hnsw" or "ivf"
+    vector_index_ann_type: str = Field(default="hnsw", env="VECTOR_INDEX_ANN_TYPE")
+
+    # Number of vectors from which "auto" rebuilds the flat index as an approximate one (in the background)
+    vector_index_ann_threshold: int = Field(default=50000, env="VECTOR_INDEX_ANN_THRESHOLD")
+
+    # HNSW graph degree (higher is more accurate, slower to build and larger)
+    vector_index_hnsw_m: int = Field(default=32, env="VECTOR_INDEX_HNSW_M")
+
+    # HNSW candidate list size at query time (recall/latency trade-off)
+    vector_index_hnsw_ef_search: int = Field(default=64, env="VECTOR_INDEX_HNSW_EF_SEARCH")
+
+    # Number of IVF lists probed per query (recall/latency trade-off)
+    vector_index_ivf_nprobe: int = Field(default=16, env="VECTOR_INDEX_IVF_NPROBE")
+
+    # Share of deleted vectors (masked at search time) from which the index is rebuilt without them, in the background
+    vector_index_max_deleted_fraction: float = Field(default=0.2, env="VECTOR_INDEX_MAX_DELETED_FRACTION")
+
+    # Vector storage: "none" (float32), "fp16" or "int8" (scalar quantization, 2x / 4x smaller) or "pq" (product quantization)
+    vector_index_compression: str = Field(default="none", env="VECTOR_INDEX_COMPRESSION")
+
+    # PQ bytes per vector, must divide the embedding dimension (0 uses dimension / 8)
+    vector_index_pq_m: int = Field(default=0, env="VECTOR_INDEX_PQ_M")
+
+    # Re-rank the candidates of a compressed index by exact distance, from float16 vector copies saved with the base (memory-mapped)
+    vector_index_rerank: bool = Field(default=True, env="VECTOR_INDEX_RERANK")
+
+    # Candidates fetched from a compressed index per requested result when re-ranking
+    vector_index_rerank_factor: int = Field(default=4, env="VECTOR_INDEX_RERANK_FACTOR")
+
+    # Number of recent queries whose embeddings and search results are kept in memory (0 disables the caches)
+    query_cache_size: int = Field(default=256, env="QUERY_CACHE_SIZE")
+
+    # Retrieve QA context with hybrid BM25 + vector search instead of vector search alone
+    hybrid_search_enabled: bool = Field(default=True, env="HYBRID_SEARCH_ENABLED")
+
+    # Weight of the vector score in hybrid search (1.0 = vector only, 0.0 = BM25 only)
+    hybrid_search_alpha: float = Field(default=0.5, env="HYBRID_SEARCH_ALPHA")
+
+    # BM25 skips query terms found in more than this fraction of the chunks (they barely change a ranking)
+    bm25_max_document_frequency: float = Field(default=0.5, env="BM25_MAX_DOCUMENT_FREQUENCY")
+
+    # Filtered searches matching at most this many chunks compare the query against those chunks only
+    filtered_search_exact_max: int = Field(default=20000, env="FILTERED_SEARCH_EXACT_MAX")
+
+    # Approximate number of tokens of retrieved context put in the QA prompt (overlapping chunks are merged first)
+    qa_context_token_budget: int = Field(default=1200, env="QA_CONTEXT_TOKEN_BUDGET")
+
+    # Most chunks retrieved for a QA question (fewer are used when only a few are relevant)
+    retrieval_max_k: int = Field(default=4, env="RETRIEVAL_MAX_K")
+
+    # Candidate chunks scored before the relevance cut-off is applied
+    retrieval_fetch_k: int = Field(default=12, env="RETRIEVAL_FETCH_K")
+
+    # Chunks less similar than this to the question (cosine similarity) are dropped, except the best one
+    retrieval_min_relevance: float = Field(default=0.3, env="RETRIEVAL_MIN_RELEVANCE")
+
+    # Best chunk similarity from which an answer is labelled high confidence
+    retrieval_high_confidence_relevance: float = Field(default=0.6, env="RETRIEVAL_HIGH_CONFIDENCE_RELEVANCE")
+
+    # Chunks more than this below the best chunk's similarity are dropped
+    retrieval_relevance_margin: float = Field(default=0.1, env="RETRIEVAL_RELEVANCE_MARGIN")
+
+    # Reuse the answer of a previous, similar question while the vector store is unchanged
+    semantic_cache_enabled: bool = Field(default=True, env="SEMANTIC_CACHE_ENABLED")
+
+    # Cosine similarity from which two questions are considered the same
+    semantic_cache_threshold: float = Field(default=0.9, env="SEMANTIC_CACHE_THRESHOLD")
+
+    # Number of answered questions kept in the semantic cache (oldest dropped first)
+    semantic_cache_max_entries: int = Field(default=1000, env="SEMANTIC_CACHE_MAX_ENTRIES")
+
+    # Show QA answers token by token as the model generates them (keywords and sources follow)
+    qa_stream_answers: bool = Field(default=True, env="QA_STREAM_ANSWERS")
+
+    # Built crews kept per crew type for reuse between requests (0 builds a new crew every time)
+    crew_pool_size: int = Field(default=2, env="CREW_POOL_SIZE")
+
     # -- MCP Server Configuration --
     mcp_words_port: int = Field(default=5001, env="MCP_WORDS_PORT")
     mcp_proxy_words_port: int = Field(default=5101, env="MCP_PROXY_WORDS_PORT")
@@ -1,10 +1,11 @@
 import logging
-from crewai import Agent, Crew, Task, Process, LLM
+from crewai import Agent, Crew, Task, Process
 from crewai.project import CrewBase, agent, task, crew
 from crewai.agents.agent_builder.base_agent import BaseAgent
 from typing import List
 
 from config.settings import settings
+from utils.llm_manager import LLMManager
 
 # Initialize logger
 logger = logging.getLogger(__name__)
@@ -33,11 +34,7 @@ class KeywordCrew:
 
     @agent
     def keyword_extractor(self) -> Agent:
-        crew_llm = LLM(
-            model=f"ollama/{settings.ollama_model}",
-            base_url=settings.ollama_base_url,
-            temperature=0.5
-        )
+        crew_llm = LLMManager.get_crew_llm(temperature=0.5)
 
         return Agent(
             config=self.agents_config['keyword_extractor'], 
@@ -1,12 +1,12 @@
 import logging
-from crewai import Agent, Crew, Task, Process, LLM
+from crewai import Agent, Crew, Task, Process
 from crewai.project import CrewBase, agent, task, crew, tool
 from crewai.agents.agent_builder.base_agent import BaseAgent
 
 from tools.mcq_parser_tool import mcqs_parser_tool
 from typing import List
 
-from config.settings import settings
+from utils.llm_manager import LLMManager
 from utils.custom_listener import MyCustomListener
 from pprint import pprint
 
@@ -35,11 +35,7 @@ class MCQParserCrew:
    
     @agent
     def mcq_parser_agent(self) -> Agent:
-        crew_llm = LLM(
-            model=f"ollama/{settings.ollama_model}",
-            base_url=settings.ollama_base_url,
-            temperature=0.0
-        )
+        crew_llm = LLMManager.get_crew_llm(temperature=0.0)
 
         return Agent(
             config=self.agents_config['mcq_parser_agent'], 
@@ -1,11 +1,14 @@
 import logging
-from crewai import Agent, Crew, Task, LLM
+import threading
+from crewai import Agent, Crew, Task
 from crewai.project import CrewBase, agent, task, crew, before_kickoff, after_kickoff
 from crewai.agents.agent_builder.base_agent import BaseAgent
-from typing import List
+from typing import Any, Dict, Iterator, List, Optional
 
 from config.settings import settings
 from utils.llm_manager import LLMManager
+from utils.context_packer import pack_context
+from utils.stream_listener import final_answer_tokens, stream_chunk_listener
 from utils.vector_store_manager import VectorStoreManager
 
 # Initialize logger
@@ -16,6 +19,16 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(name)s - %(message)s"
 )
 
+
+def confidence(relevance: float) -> str:
+    """Confidence label from the cosine similarity of the best retrieved chunk"""
+    if relevance >= settings.retrieval_high_confidence_relevance:
+        return "high"
+    if relevance >= settings.retrieval_min_relevance:
+        return "medium"
+    return "low"
+
+
 @CrewBase
 class QACrew:
     """Crew for answering questions based on financial documents using RAG"""
@@ -29,21 +42,29 @@ class QACrew:
     def __init__(self, vector_manager: VectorStoreManager):
         self.vector_manager = vector_manager
         self.last_inputs = {}
+        self.last_result = {}
 
     @before_kickoff
     def prepare_inputs(self, inputs):
         logger.info("Preparing inputs for crew execution.")
         question = inputs.get("question", "")
+        # Pooled instances answer many questions
+        self.last_inputs = {}
         
         try:
-            relevant_docs = self.vector_manager.similarity_search(question, k=4)
-            self.last_inputs["relevant_docs"] = relevant_docs;
+            # As many chunks as are relevant, up to settings.retrieval_max_k
+            scored_docs = self.vector_manager.relevance_search(question)
+            relevant_docs = [doc for doc, _ in scored_docs]
+            self.last_inputs["relevance"] = max((score for _, score in scored_docs), default=0.0)
 
             if not relevant_docs:
+                self.last_inputs["relevant_docs"] = relevant_docs
                 logger.warning("No relevant documents found for question: %s", question)
                 inputs["context"] = "No relevant documents found."
             else:
-                context = "\n\n".join([doc.page_content for doc in relevant_docs])
+                # Merge overlapping chunks and drop repeated text so the prompt stays within budget
+                context, relevant_docs = pack_context(relevant_docs, settings.qa_context_token_budget)
+                self.last_inputs["relevant_docs"] = relevant_docs
                 logger.info("Context prepared with %d documents.", len(relevant_docs))
                 inputs["context"] = context
 
@@ -67,7 +88,6 @@ class QACrew:
         logger.info(f"Processing output from agent")
 
         try: 
-            relevant_docs = self.last_inputs.get("relevant_docs", [])
             tasks_output = output.dict().get("tasks_output", [])
 
             answer = ""
@@ -83,14 +103,7 @@ class QACrew:
                 elif task_name == "extract_keywords":
                     keywords = [kw.strip() for kw in task_raw.split(",") if kw.strip()]
 
-            return {
-                "success": True,
-                "answer": answer,
-                "keywords": keywords,
-                "sources": self.last_inputs.get("sources", []),
-                "confidence": "high" if len(relevant_docs) >= 3 else "medium",
-                "num_sources": len(relevant_docs)
-            }
+            return self.build_result(answer, keywords)
         except Exception as e:
             logger.error("Error in process_output: %s", str(e))
             return {
@@ -100,13 +113,61 @@ class QACrew:
                 "confidence": "low"
             }
 
+    def build_result(self, answer: str, keywords: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Result of an answer to the question last passed to prepare_inputs"""
+        relevant_docs = self.last_inputs.get("relevant_docs", [])
+        return {
+            "success": True,
+            "answer": answer,
+            "keywords": keywords,
+            "sources": self.last_inputs.get("sources", []),
+            "confidence": confidence(self.last_inputs.get("relevance", 0.0)),
+            "relevance": self.last_inputs.get("relevance", 0.0),
+            "num_sources": len(relevant_docs)
+        }
+
+    def stream_answer(self, question: str) -> Iterator[str]:
+        """Kick off the crew and yield the answer tokens as the agent's LLM streams them.
+
+        The kickoff is the same as a non-streamed one (same agent, task, LLM and
+        response cache) but runs in a background thread; the result of
+        `process_output` is in `last_result` once the generator is exhausted.
+        A cached response has no tokens and is yielded whole.
+        """
+        crew = self.crew()
+        outcome = {}
+        done = object()
+
+        with stream_chunk_listener.subscribe(crew.agents[0].id) as chunks:
+            def kickoff():
+                try:
+                    outcome["result"] = crew.kickoff(inputs={"question": question})
+                except Exception as e:
+                    outcome["error"] = e
+                finally:
+                    chunks.put(done)
+
+            thread = threading.Thread(target=kickoff, name="qa-stream", daemon=True)
+            thread.start()
+            streamed = False
+            try:
+                for token in final_answer_tokens(iter(chunks.get, done)):
+                    streamed = True
+                    yield token
+            finally:
+                # The crew goes back to the pool only once its kickoff is over
+                thread.join()
+
+        if "error" in outcome:
+            raise outcome["error"]
+        self.last_result = outcome["result"]
+        if not streamed:
+            yield self.last_result["answer"]
+
     @agent
     def financial_qa_specialist(self) -> Agent:
-        crew_llm = LLM(
-            model=f"ollama/{settings.ollama_model}",
-            base_url=settings.ollama_base_url,
-            temperature=0.7
-        )
+        # Streams its tokens when answers are shown as they are generated
+        crew_llm = LLMManager.get_crew_llm(temperature=0.7, stream=settings.qa_stream_answers)
 
         return Agent(
             config=self.agents_config['financial_qa_specialist'], 
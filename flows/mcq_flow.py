@@ -9,6 +9,7 @@ from crews.mcq_crew.mcq_crew import MCQCrew
 from crews.mcq_parser_crew.mcq_parser_crew import MCQParserCrew
 
 from utils.flow_helpers import handle_exceptions
+from utils.crew_pool import crew_pool
 from langchain.schema import Document
 
 class MCQState(BaseModel):
@@ -62,12 +63,13 @@ class MCQFlow(Flow[MCQState]):
     def generate_mcqs(self):
         logger.debug("generate_mcqs")
         
-        result = MCQCrew().crew().kickoff(inputs={
-            "full_text": self.state.full_text,
-            "num_questions": self.state.num_questions,
-            "difficulty": self.state.difficulty,
-            "difficulty_instructions": self.state.difficulty_instructions,
-        })
+        with crew_pool.acquire(MCQCrew, MCQCrew) as mcq_crew:
+            result = mcq_crew.crew().kickoff(inputs={
+                "full_text": self.state.full_text,
+                "num_questions": self.state.num_questions,
+                "difficulty": self.state.difficulty,
+                "difficulty_instructions": self.state.difficulty_instructions,
+            })
 
         self.state.questions_text = str(result)
         return { "questions_text": self.state.questions_text }
@@ -86,9 +88,10 @@ class MCQFlow(Flow[MCQState]):
                 "message": "No generated questions to parse."
             }
 
-        result = MCQParserCrew().crew().kickoff(inputs={
-            "raw_text": self.state.questions_text
-        })
+        with crew_pool.acquire(MCQParserCrew, MCQParserCrew) as parser_crew:
+            result = parser_crew.crew().kickoff(inputs={
+                "raw_text": self.state.questions_text
+            })
 
         raw = result.raw
         raw = raw.strip()
@@ -1,12 +1,16 @@
 import logging
-from typing import Any
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
 
 from pydantic import BaseModel
 from crewai.flow.flow import Flow, listen, start
 from crews.qa_crew.qa_crew import QACrew
 from crews.keyword_crew.keyword_crew import KeywordCrew
 
+from config.settings import settings
 from utils.vector_store_manager import VectorStoreManager
+from utils.semantic_cache import SemanticAnswerCache
+from utils.crew_pool import crew_pool
 
 from utils.flow_helpers import handle_exceptions
 
@@ -18,17 +22,23 @@ class QAState(BaseModel):
     sources: list[dict[str, Any]] = []
     confidence: str = "low"
     keywords: str = ""
+    cached: bool = False
 
 class QAFlow(Flow[QAState]):
 
-    def __init__(self, vector_manager: VectorStoreManager):
+    def __init__(self, vector_manager: VectorStoreManager, answer_cache: Optional[SemanticAnswerCache] = None):
         super().__init__(QAState())  
         self.vector_manager = vector_manager
+        self._answer_version = None
+        if answer_cache is None and settings.semantic_cache_enabled:
+            answer_cache = SemanticAnswerCache(vector_manager.embeddings)
+        self.answer_cache = answer_cache
 
     @start()
     @handle_exceptions
     def get_the_question(self):
         logger.debug(f"Starting qa flow for {self.state.question}")
+        self._reset_state()
         
         return {"question": self.state.question}
 
@@ -37,9 +47,21 @@ class QAFlow(Flow[QAState]):
     def answer_for_question(self):
         logger.debug("answer_for_question")
 
-        result = QACrew(self.vector_manager).crew().kickoff(inputs={"question": self.state.question})
+        if self._use_cached_answer():
+            return {
+                "success": True,
+                "answer": self.state.answer,
+                "sources": self.state.sources,
+                "confidence": self.state.confidence
+            }
+
+        # Read before answering, so an answer is never cached under a version it has not seen
+        version = self.vector_manager.index_version
+        with self._qa_crew() as qa_crew:
+            result = qa_crew.crew().kickoff(inputs={"question": self.state.question})
 
         if result['success']:
+            self._answer_version = version
             self.state.answer = result['answer']
             self.state.sources = result['sources']
             self.state.confidence = result['confidence']
@@ -62,13 +84,86 @@ class QAFlow(Flow[QAState]):
     def generate_keywords(self):
         logger.debug("generate_keywords")
 
-        result = KeywordCrew().crew().kickoff(inputs={"answer": self.state.answer})
-        self.state.keywords = result.raw
+        return self._finish()
+
+    def stream(self, question: str) -> Iterator[str]:
+        """Answer a question outside the flow, yielding answer tokens as they are generated.
+
+        Meant for `st.write_stream`; call `finish_stream` afterwards for the
+        keywords, sources and confidence.
+        """
+        self.state.question = question
+        self._reset_state()
+        if self._use_cached_answer():
+            yield self.state.answer
+            return
+
+        version = self.vector_manager.index_version
+        with self._qa_crew() as qa_crew:
+            yield from qa_crew.stream_answer(question)
+            result = qa_crew.last_result
+        if not result['success']:
+            raise RuntimeError(result['answer'])
+        self.state.answer = result['answer']
+        self.state.sources = result['sources']
+        self.state.confidence = result['confidence']
+        self._answer_version = version
+
+    @handle_exceptions(default_return={
+        "success": False,
+        "answer": "An error occurred during post-processing.",
+        "sources": [],
+        "confidence": "low"
+    })
+    def finish_stream(self):
+        """Keywords and full result of the answer last produced by `stream`"""
+        return self._finish()
+
+    @contextmanager
+    def _qa_crew(self) -> Iterator[QACrew]:
+        """Pooled QA crew searching this flow's vector store for one request"""
+        with crew_pool.acquire(QACrew, lambda: QACrew(None)) as qa_crew:
+            qa_crew.vector_manager = self.vector_manager
+            try:
+                yield qa_crew
+            finally:
+                # Idle crews must not keep a replaced vector store alive
+                qa_crew.vector_manager = None
+
+    def _reset_state(self):
+        # The state is reused between questions
+        self.state.cached = False
+        self.state.keywords = ""
+        self._answer_version = None
+
+    def _use_cached_answer(self) -> bool:
+        """Load the answer of a similar question from the semantic cache into the state"""
+        if self.answer_cache is None:
+            return False
+        cached = self.answer_cache.lookup(self.state.question, self.vector_manager.index_version)
+        if cached is None:
+            return False
+        self.state.answer = cached["answer"]
+        self.state.sources = cached["sources"]
+        self.state.confidence = cached["confidence"]
+        self.state.keywords = cached["keywords"]
+        self.state.cached = True
+        return True
+
+    def _finish(self):
+        """Generate keywords for a new answer and cache it"""
+        if not self.state.cached:
+            with crew_pool.acquire(KeywordCrew, KeywordCrew) as keyword_crew:
+                result = keyword_crew.crew().kickoff(inputs={"answer": self.state.answer})
+            self.state.keywords = result.raw
 
-        return {
+        output = {
                 "success": True,
                 "answer": self.state.answer,
                 "sources": self.state.sources,
                 "confidence": self.state.confidence,
                 "keywords": self.state.keywords
             }
+        if self.answer_cache is not None and self._answer_version is not None:
+            self.answer_cache.store(self.state.question, self._answer_version, output)
+        return output
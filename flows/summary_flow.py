@@ -6,6 +6,7 @@ from crewai.flow.flow import Flow, listen, start
 from crews.summary_crew.summary_crew import SummaryCrew
 
 from utils.flow_helpers import handle_exceptions
+from utils.crew_pool import crew_pool
 from langchain.schema import Document
 
 class SummaryState(BaseModel):
@@ -70,11 +71,12 @@ class SummaryFlow(Flow[SummaryState]):
     def generate_summary(self):
         logger.debug("generate_summary")
 
-        result = SummaryCrew().crew().kickoff(inputs={
-            "full_text": self.state.full_text,
-            "instructions": self.state.instructions,
-            "summary_type": self.state.summary_type
-        })
+        with crew_pool.acquire(SummaryCrew, SummaryCrew) as summary_crew:
+            result = summary_crew.crew().kickoff(inputs={
+                "full_text": self.state.full_text,
+                "instructions": self.state.instructions,
+                "summary_type": self.state.summary_type
+            })
 
         self.state.summary_text = str(result)
         return { "summary_text": self.state.summary_text }
@@ -0,0 +1,86 @@
+import time
+from types import SimpleNamespace
+
+from crews.keyword_crew.keyword_crew import KeywordCrew
+from crews.mcq_crew.mcq_crew import MCQCrew
+from crews.mcq_parser_crew.mcq_parser_crew import MCQParserCrew
+from crews.qa_crew.qa_crew import QACrew
+from crews.summary_crew.summary_crew import SummaryCrew
+from flows.qa_flow import QAFlow
+from utils.crew_pool import CrewPool, crew_pool
+
+NUM_REQUESTS = 20
+
+# Setup only: the crews are built (or taken from the pool) but not kicked off, so no LLM is needed
+CREWS = {
+    "QACrew": lambda: QACrew(None),
+    "SummaryCrew": SummaryCrew,
+    "MCQCrew": MCQCrew,
+    "MCQParserCrew": MCQParserCrew,
+    "KeywordCrew": KeywordCrew,
+}
+
+
+def per_request_ms(setup) -> float:
+    start = time.perf_counter()
+    for _ in range(NUM_REQUESTS):
+        setup()
+    return (time.perf_counter() - start) / NUM_REQUESTS * 1000
+
+
+def check_tool_cache_reset(pool: CrewPool):
+    """A tool result cached during one request is not reused by the next"""
+    with pool.acquire("cache-check", SummaryCrew) as instance:
+        instance.crew()._cache_handler.add("extract_keywords", "{}", "stale")
+    with pool.acquire("cache-check", SummaryCrew) as instance:
+        crew = instance.crew()
+        assert crew._cache_handler.read("extract_keywords", "{}") is None
+        assert all(agent.cache_handler.read("extract_keywords", "{}") is None for agent in crew.agents)
+    print("+ Tool cache cleared between requests")
+
+
+def check_qa_crew_release():
+    """QA flows share pooled crews, which keep no vector store once idle"""
+    managers = [object(), object()]
+    for manager in managers:
+        # Only the flow's vector_manager is used, no need for a real store
+        with QAFlow._qa_crew(SimpleNamespace(vector_manager=manager)) as qa_crew:
+            assert qa_crew.vector_manager is manager
+    idle = crew_pool._idle.get(QACrew, [])
+    assert len(idle) == 1 and idle[0].vector_manager is None, idle
+    print("+ Idle QA crew shared by both flows, without a vector store")
+
+
+def main():
+    pool = CrewPool(max_idle=1)
+    check_tool_cache_reset(pool)
+    check_qa_crew_release()
+
+    print(f"Per-request crew setup time over {NUM_REQUESTS} requests")
+    for name, factory in CREWS.items():
+        def build():
+            instance = factory()
+            instance.crew()
+            # Built per request, the MCP connection is closed after the kickoff
+            CrewPool._close(instance)
+
+        def pooled():
+            with pool.acquire(name, factory) as instance:
+                instance.crew()
+
+        try:
+            built = per_request_ms(build)
+            # Includes the first build
+            reused = per_request_ms(pooled)
+        except Exception as e:
+            # KeywordCrew needs the MCP words proxy running
+            print(f"{name:14s} skipped: {e}")
+            continue
+        print(f"{name:14s} new crew {built:8.2f} ms   pooled {reused:8.3f} ms")
+
+    pool.close()
+    print(f"Pool: {pool.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import time
+from typing import Optional
+
+import numpy as np
+
+from config.settings import settings
+from utils.llm_manager import LLMManager
+
+SAMPLE_CHUNK = (
+    "Revenue increased by 12% to $4.2 billion in fiscal 2023, driven by higher "
+    "volumes in the consumer segment. Operating margin improved to 18.4% while "
+    "net debt decreased to $1.1 billion at year end. "
+)
+
+CHECK_TEXTS = [
+    SAMPLE_CHUNK,
+    "What was the operating margin in fiscal 2023?",
+    "The board proposed a final dividend of 4.5p per share.",
+    "Cash flow from operations was $640 million.",
+]
+
+# Lowest cosine similarity to the torch embeddings of the same texts
+MIN_COSINE = {"onnx": 0.999, "onnx-int8": 0.98}
+
+
+def load_backend(backend: str):
+    """Fresh embeddings of a backend, without the embedding cache"""
+    settings.embedding_backend = backend
+    settings.embedding_cache_enabled = False
+    LLMManager._embeddings_instance = None
+    return LLMManager.get_embeddings()
+
+
+def check_output(backend: str, vectors: np.ndarray, reference: Optional[np.ndarray] = None):
+    """One unit vector per text, close to the torch embeddings when given"""
+    assert vectors.ndim == 2 and len(vectors) == len(CHECK_TEXTS) and vectors.shape[1] > 0, vectors.shape
+    norms = np.linalg.norm(vectors, axis=1)
+    assert np.allclose(norms, 1.0, atol=1e-3), f"{backend}: embeddings are not normalized ({norms})"
+    if reference is not None:
+        assert vectors.shape == reference.shape, (vectors.shape, reference.shape)
+        cosines = (vectors * reference).sum(axis=1)
+        assert cosines.min() >= MIN_COSINE[backend], f"{backend}: cosine to torch {cosines.min():.4f}"
+        print(f"  cosine to torch: min {cosines.min():.4f}")
+
+
+def benchmark(embeddings, num_chunks: int = 512) -> float:
+    """Return the embedding throughput in chunks per second"""
+    texts = [f"{i}: {SAMPLE_CHUNK * 5}" for i in range(num_chunks)]
+    embeddings.embed_documents(texts[:settings.embedding_batch_size])  # warm-up
+
+    start = time.perf_counter()
+    embeddings.embed_documents(texts)
+    return num_chunks / (time.perf_counter() - start)
+
+
+def main():
+    saved = (settings.embedding_backend, settings.embedding_cache_enabled, LLMManager._embeddings_instance)
+    print(f"Batch size: {settings.embedding_batch_size}, threads: {settings.embedding_threads or 'default'}")
+    results = {}
+    reference = None
+    try:
+        for backend in ["torch", "onnx", "onnx-int8"]:
+            try:
+                embeddings = load_backend(backend)
+            except Exception as e:
+                print(f"- {backend}: unavailable ({e})")
+                continue
+
+            vectors = np.asarray(embeddings.embed_documents(CHECK_TEXTS), dtype=np.float32)
+            check_output(backend, vectors, reference if backend != "torch" else None)
+            if backend == "torch":
+                reference = vectors
+            results[backend] = benchmark(embeddings)
+            print(f"+ {backend}: {results[backend]:.1f} chunks/s")
+    finally:
+        settings.embedding_backend, settings.embedding_cache_enabled, LLMManager._embeddings_instance = saved
+
+    if "torch" in results:
+        for backend, throughput in results.items():
+            print(f"{backend}: {throughput / results['torch']:.2f}x torch")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import time
+from typing import List
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+from config.settings import settings
+from utils import ann_index
+from utils.exact_vectors import ExactVectors
+from utils.vector_store_manager import VectorStoreManager
+
+NUM_QUERIES = 200
+K = 10
+# Lowest recall@K accepted after re-ranking. PQ keeps too little of each vector for its
+# candidates to contain the true top-K, so its re-ranking is only checked not to lower recall
+MIN_RERANKED_RECALL = 0.95
+
+
+class NoEmbeddings(Embeddings):
+    """Stands in for the embedding model: the test only reads vectors already computed"""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        raise RuntimeError("The index compression test does not embed text")
+
+    def embed_query(self, text: str) -> List[float]:
+        raise RuntimeError("The index compression test does not embed text")
+
+
+def load_vectors() -> np.ndarray:
+    """Vectors of the saved vector store, or clustered synthetic ones if there is none"""
+    manager = VectorStoreManager(NoEmbeddings())
+    if manager.load_vector_store() and manager.vector_store.index.ntotal > NUM_QUERIES:
+        index = manager.vector_store.index
+        if ann_index.compression_type(index) != "none":
+            print("Warning: the saved index is compressed, recall is measured against its decoded vectors")
+        return index.reconstruct_n(0, index.ntotal)
+
+    print("No saved vector store, using synthetic vectors")
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(200, 384)).astype(np.float32)
+    vectors = centers[rng.integers(0, 200, 50000)] + 0.3 * rng.normal(size=(50000, 384)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def recall(found: np.ndarray, expected: np.ndarray) -> float:
+    return float(np.mean([len(set(f) & set(e)) / len(e) for f, e in zip(found, expected)]))
+
+
+def rerank(index, queries: np.ndarray, exact_vectors: ExactVectors) -> np.ndarray:
+    """Top-K after re-ranking the index candidates by distance to their stored exact vectors"""
+    _, candidates = index.search(queries, K * settings.vector_index_rerank_factor)
+    reranked = []
+    for query, row in zip(queries, candidates):
+        row = row[row >= 0]
+        distances = ((exact_vectors.get([str(position) for position in row]) - query) ** 2).sum(axis=1)
+        reranked.append(row[np.argsort(distances)[:K]])
+    return np.array(reranked)
+
+
+def main():
+    vectors = load_vectors()
+    queries, vectors = vectors[:NUM_QUERIES], vectors[NUM_QUERIES:]
+    print(f"{len(vectors)} vectors of dimension {vectors.shape[1]}, recall@{K} over {NUM_QUERIES} queries")
+
+    exact = ann_index.build_index(vectors, "flat", compression="none")
+    _, expected = exact.search(queries, K)
+    # What VectorStoreManager keeps next to a compressed index
+    exact_vectors = ExactVectors()
+    exact_vectors.add([str(position) for position in range(len(vectors))], vectors)
+    failures = []
+
+    for kind in ["flat", "hnsw"]:
+        for compression in ["none", "fp16", "int8", "pq"]:
+            start = time.perf_counter()
+            index = ann_index.build_index(vectors, kind, compression=compression)
+            build_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            _, found = index.search(queries, K)
+            latency = (time.perf_counter() - start) / NUM_QUERIES * 1000
+
+            base_recall = recall(found, expected)
+            reranked_recall = recall(rerank(index, queries, exact_vectors), expected)
+            index_bytes = ann_index.bytes_per_vector(index)
+            # A compressed index keeps the float16 copies it is re-ranked with (on disk, memory-mapped)
+            exact_bytes = exact_vectors.nbytes() / len(vectors) if compression != "none" else 0
+            print(
+                f"{kind:5s} {compression:5s} {index_bytes:7.1f} B/vector (+{exact_bytes:.0f} re-rank copies)  "
+                f"recall {base_recall:.3f} ({base_recall - 1:+.3f} vs flat), "
+                f"re-ranked {reranked_recall:.3f} ({reranked_recall - 1:+.3f})  "
+                f"{latency:.3f} ms/query, built in {build_time:.1f}s"
+            )
+            floor = base_recall - 0.01 if compression == "pq" else MIN_RERANKED_RECALL
+            if reranked_recall < floor:
+                failures.append(f"{kind} {compression}: {reranked_recall:.3f}")
+
+    assert not failures, f"Re-ranked recall@{K} too low: {', '.join(failures)}"
+
+
+if __name__ == "__main__":
+    main()
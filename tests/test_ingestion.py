@@ -0,0 +1,86 @@
+import os
+import hashlib
+import tempfile
+from typing import List
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+from config.settings import settings
+from utils.document_loader import DocumentLoader
+from utils.ingest import ingest_file
+from utils.ingestion_cache import IngestionCache
+from utils.vector_store_manager import VectorStoreManager
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings, so the test needs no embedding model"""
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(64, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1
+        return (vector / (np.linalg.norm(vector) or 1)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def write_csv(path: str, revenue: int):
+    with open(path, 'w') as f:
+        f.write("year,segment,revenue\n")
+        for year in range(2000, 2040):
+            f.write(f"{year},consumer,{revenue + year}\n")
+
+
+def main():
+    vector_store_path = settings.vector_store_path
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.vector_store_path = tmp
+        try:
+            upload_dir = os.path.join(tmp, "uploads")
+            os.makedirs(upload_dir)
+            file_path = os.path.join(upload_dir, "report.csv")
+
+            manager = VectorStoreManager(HashEmbeddings())
+            doc_loader = DocumentLoader()
+            ingestion_cache = IngestionCache(os.path.join(tmp, "ingestion_cache"))
+
+            write_csv(file_path, 100)
+            added = ingest_file(manager, doc_loader, ingestion_cache, file_path, [])
+            ntotal = manager.vector_store.index.ntotal
+            assert added > 0 and ntotal == added, (added, ntotal)
+            assert manager.sources() == {"report.csv": added}
+            print(f"+ Upload: {added} chunks")
+
+            # Same file again: already indexed, nothing added
+            assert ingest_file(manager, doc_loader, ingestion_cache, file_path, []) == 0
+            assert manager.vector_store.index.ntotal == ntotal
+            print("+ Re-upload of the same file skipped")
+
+            # New version of the file: its chunks are replaced, not duplicated
+            write_csv(file_path, 200)
+            replaced = ingest_file(manager, doc_loader, ingestion_cache, file_path, [])
+            assert replaced == added, (replaced, added)
+            # The old vectors are masked out of searches until a background rebuild drops them
+            stats = manager.stats()
+            live = stats["num_vectors"] - stats["deleted_vectors"]
+            assert live == ntotal, stats
+            assert manager.sources() == {"report.csv": added}
+            assert len(manager.ingested_keys) == 1
+            results = manager.similarity_search("consumer revenue", k=2 * ntotal)
+            assert {doc.id for doc in results} == set(manager.source_ids["report.csv"]), results
+            print(f"+ Re-upload of a changed file replaced {replaced} chunks, still {live} searchable")
+
+            manager.wait_for_index_rebuild()
+            manager.wait_for_compaction()
+        finally:
+            settings.vector_store_path = vector_store_path
+    print("Ingestion test passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+import math
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from config.settings import settings
+from utils.mmap_docstore import PositionIds
+
+logger = logging.getLogger(__name__)
+
+# IVF needs about this many training vectors per list to place its centroids well
+_IVF_MIN_POINTS_PER_LIST = 39
+_IVF_MAX_POINTS_PER_LIST = 256
+# Product quantization trains 256 centroids per sub-quantizer, it stays uncompressed below this size
+_PQ_MIN_TRAINING_VECTORS = 256 * _IVF_MIN_POINTS_PER_LIST
+_MAX_TRAINING_VECTORS = 65536
+
+# index_factory suffix of each vector compression mode
+_COMPRESSION_CODES = {"none": "Flat", "fp16": "SQfp16", "int8": "SQ8"}
+
+# index_to_docstore_id value of a position whose document was deleted (its vector stays until a rebuild)
+DELETED_ID = ""
+
+
+def index_type(index: faiss.Index) -> str:
+    """"flat", "ivf" or "hnsw" for a FAISS index"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def compression_type(index: faiss.Index) -> str:
+    """"none", "fp16", "int8" or "pq" for the vectors stored by a FAISS index"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return "pq"
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return "fp16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "int8"
+    return "none"
+
+
+def target_compression(num_vectors: int) -> str:
+    """Compression the settings ask for at this corpus size"""
+    compression = settings.vector_index_compression
+    if compression not in ("none", "fp16", "int8", "pq"):
+        raise ValueError(f"Unsupported vector compression: {compression}")
+    if compression == "pq" and num_vectors < _PQ_MIN_TRAINING_VECTORS:
+        return "none"
+    return compression
+
+
+def pq_subquantizers(dim: int) -> int:
+    """Number of PQ sub-quantizers (bytes per vector), a divisor of the dimension"""
+    m = settings.vector_index_pq_m or max(1, dim // 8)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def bytes_per_vector(index: faiss.Index) -> float:
+    """Approximate memory used per stored vector, codes plus index structure"""
+    typed = faiss.downcast_index(index)
+    if isinstance(typed, faiss.IndexHNSW):
+        # Stored codes plus the level-0 neighbor links (4 bytes each)
+        return faiss.downcast_index(typed.storage).code_size + typed.hnsw.nb_neighbors(0) * 4
+    if isinstance(typed, faiss.IndexIVF):
+        # Codes plus the 8-byte id kept in the inverted list
+        return typed.code_size + 8
+    if isinstance(typed, faiss.IndexFlatCodes):
+        return typed.code_size
+    return typed.d * 4
+
+
+def ivf_nlist(num_vectors: int) -> int:
+    """Number of IVF lists for a corpus size (~4 * sqrt(n), capped by what can be trained)"""
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // _IVF_MIN_POINTS_PER_LIST))
+
+
+def target_index_type(num_vectors: int) -> str:
+    """Index type the settings ask for at this corpus size"""
+    if settings.vector_index_type == "auto":
+        if num_vectors >= settings.vector_index_ann_threshold:
+            return settings.vector_index_ann_type
+        return "flat"
+    return settings.vector_index_type
+
+
+def rebuild_target(index: faiss.Index, num_deleted: int = 0) -> Optional[str]:
+    """Index type to rebuild `index` as, or None if it still fits the corpus.
+
+    An IVF index is also retrained once the corpus has outgrown its number of lists,
+    any index is rebuilt when its vector compression differs from the settings, and
+    once `num_deleted` of its vectors reach `vector_index_max_deleted_fraction`.
+    """
+    current = index_type(index)
+    num_vectors = index.ntotal - num_deleted
+    target = target_index_type(num_vectors)
+    if target not in ("flat", "ivf", "hnsw"):
+        raise ValueError(f"Unsupported vector index type: {target}")
+    if target != current or target_compression(num_vectors) != compression_type(index):
+        return target
+    if num_deleted and num_deleted >= settings.vector_index_max_deleted_fraction * index.ntotal:
+        return target
+    if current == "ivf" and ivf_nlist(num_vectors) >= 2 * faiss.downcast_index(index).nlist:
+        return target
+    return None
+
+
+def tune_index(index: faiss.Index) -> faiss.Index:
+    """Apply the query-time settings to an index (also after loading it from disk)"""
+    # The downcast wrapper does not own the index, so the original object is returned
+    typed = faiss.downcast_index(index)
+    if isinstance(typed, faiss.IndexHNSW):
+        typed.hnsw.efSearch = settings.vector_index_hnsw_ef_search
+    elif isinstance(typed, faiss.IndexIVF):
+        typed.nprobe = min(settings.vector_index_ivf_nprobe, typed.nlist)
+        # Needed to reconstruct vectors (rebuilds, recall estimates)
+        if typed.direct_map.type == faiss.DirectMap.NoMap:
+            typed.set_direct_map_type(faiss.DirectMap.Array)
+    return index
+
+
+def build_index(
+    vectors: np.ndarray,
+    kind: str,
+    metric: int = faiss.METRIC_L2,
+    compression: Optional[str] = None
+) -> faiss.Index:
+    """Build (and train, for IVF and PQ) an index of the given type holding `vectors`"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    num_vectors, dim = vectors.shape
+    compression = compression or target_compression(num_vectors)
+
+    if compression == "pq":
+        codes = f"PQ{pq_subquantizers(dim)}"
+    elif compression in _COMPRESSION_CODES:
+        codes = _COMPRESSION_CODES[compression]
+    else:
+        raise ValueError(f"Unsupported vector compression: {compression}")
+
+    max_training = _MAX_TRAINING_VECTORS
+    if kind == "hnsw":
+        m = settings.vector_index_hnsw_m
+        if compression == "none":
+            description = f"HNSW{m}"
+        elif compression == "pq":
+            description = f"HNSW{m}_{codes}"
+        else:
+            description = f"HNSW{m},{codes}"
+    elif kind == "ivf":
+        nlist = ivf_nlist(num_vectors)
+        description = f"IVF{nlist},{codes}"
+        max_training = max(max_training, nlist * _IVF_MAX_POINTS_PER_LIST)
+    elif kind == "flat":
+        description = codes
+    else:
+        raise ValueError(f"Unsupported vector index type: {kind}")
+
+    index = faiss.index_factory(dim, description, metric)
+    if kind == "hnsw":
+        faiss.downcast_index(index).hnsw.efConstruction = max(40, 2 * settings.vector_index_hnsw_m)
+    if not index.is_trained:
+        sample = vectors
+        if num_vectors > max_training:
+            rows = np.random.default_rng(0).choice(num_vectors, max_training, replace=False)
+            sample = vectors[np.sort(rows)]
+        index.train(sample)
+
+    tune_index(index)
+    index.add(vectors)
+    return index
+
+
+def exact_search(index: faiss.Index, queries: np.ndarray, k: int) -> np.ndarray:
+    """Exact top-k ids over the vectors of an approximate index, to measure its recall"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.downcast_index(index.storage).search(queries, k)[1]
+    if isinstance(index, faiss.IndexIVF):
+        # Probing every list is exhaustive
+        return index.search(queries, k, params=faiss.SearchParametersIVF(nprobe=index.nlist))[1]
+    return index.search(queries, k)[1]
+
+
+def describe(index: faiss.Index) -> Dict[str, Any]:
+    """Type and tuning parameters of an index"""
+    index = faiss.downcast_index(index)
+    kind = index_type(index)
+    info: Dict[str, Any] = {
+        "index_type": kind,
+        "compression": compression_type(index),
+        "num_vectors": index.ntotal,
+        "dimension": index.d,
+        "bytes_per_vector": bytes_per_vector(index),
+    }
+    if kind == "hnsw":
+        info.update({"m": index.hnsw.nb_neighbors(1), "ef_search": index.hnsw.efSearch})
+    elif kind == "ivf":
+        info.update({"nlist": index.nlist, "nprobe": index.nprobe})
+    return info
+
+
+def remove_documents(vector_store: FAISS, ids: Iterable[str], positions: Optional[List[int]] = None) -> List[int]:
+    """Delete documents from a langchain FAISS store, returns the index positions they had.
+
+    Their vectors stay in the index, so nothing is renumbered or rebuilt: the positions
+    map to DELETED_ID and searches must leave them out (`search_excluding`) until the
+    index is rebuilt without them. `positions` saves looking the ids up when known.
+    """
+    ids = set(ids)
+    mapping = vector_store.index_to_docstore_id
+    if positions is None:
+        positions = [pos for pos, id_ in mapping.items() if id_ in ids]
+    vector_store.docstore.delete([mapping[pos] for pos in positions])
+    for pos in positions:
+        mapping[pos] = DELETED_ID
+    return positions
+
+
+def deleted_positions(vector_store: FAISS) -> List[int]:
+    """Positions of the vectors whose documents were deleted"""
+    mapping = vector_store.index_to_docstore_id
+    if isinstance(mapping, PositionIds):
+        return mapping.positions_of(DELETED_ID)
+    return sorted(pos for pos, id_ in mapping.items() if id_ == DELETED_ID)
+
+
+def search_subset(index: faiss.Index, queries: np.ndarray, k: int, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Exact search restricted to the vectors at `positions` (sorted), for small filtered subsets.
+
+    Only the selected vectors are read and compared, so a selective filter costs less
+    than a full search.
+    """
+    subset = index.reconstruct_batch(positions)
+    distances, rows = faiss.knn(queries, subset, min(k, len(positions)), metric=index.metric_type)
+    labels = np.where(rows >= 0, positions[np.maximum(rows, 0)], -1)
+    if labels.shape[1] < k:
+        # Pad to k columns like index.search does
+        padding = k - labels.shape[1]
+        labels = np.pad(labels, ((0, 0), (0, padding)), constant_values=-1)
+        distances = np.pad(distances, ((0, 0), (0, padding)), constant_values=np.inf)
+    return distances, labels
+
+
+def search_selected(index: faiss.Index, queries: np.ndarray, k: int, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Search only the vectors at `positions`, passing them to FAISS as an ID bitmap.
+
+    Non-selected vectors are skipped inside the search itself, so the top-k is
+    taken among matching vectors only (no recall lost to post-filtering).
+    """
+    mask = np.zeros(index.ntotal, dtype=bool)
+    mask[positions] = True
+    return _search_mask(index, queries, k, mask)
+
+
+def search_excluding(index: faiss.Index, queries: np.ndarray, k: int, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Search every vector except those at `positions` (deleted ones), skipped inside the search"""
+    mask = np.ones(index.ntotal, dtype=bool)
+    mask[positions] = False
+    return _search_mask(index, queries, k, mask)
+
+
+def _search_mask(index: faiss.Index, queries: np.ndarray, k: int, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    bitmap = np.packbits(mask, bitorder="little")
+    selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+
+    typed = faiss.downcast_index(index)
+    if isinstance(typed, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=typed.hnsw.efSearch)
+    elif isinstance(typed, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=typed.nprobe)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+
+    try:
+        return index.search(queries, k, params=params)
+    except RuntimeError as e:
+        # Index types without selector support: over-fetch and filter afterwards
+        logger.warning(f"Index does not support ID selectors ({e}), filtering results instead")
+        num_selected = int(mask.sum())
+        fetch_k = min(index.ntotal, max(k, k * index.ntotal // max(num_selected, 1)))
+        distances, labels = index.search(queries, fetch_k)
+        keep = np.where(labels >= 0, mask[np.maximum(labels, 0)], False)
+        filtered_distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        filtered_labels = np.full((len(queries), k), -1, dtype=np.int64)
+        for row in range(len(queries)):
+            selected = np.flatnonzero(keep[row])[:k]
+            filtered_distances[row, :len(selected)] = distances[row, selected]
+            filtered_labels[row, :len(selected)] = labels[row, selected]
+        return filtered_distances, filtered_labels
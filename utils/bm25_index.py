@@ -0,0 +1,260 @@
+import re
+import math
+import logging
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Words, numbers and the tokens financial questions hinge on: "4.2", "10-k", "fy2023", "q3"
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+
+# Words in nearly every chunk: they cost the largest postings and barely change a ranking
+_STOPWORDS = frozenset(
+    "a an and are as at be been by for from has have in into is it its of on or that the "
+    "their this to was were which will with".split()
+)
+
+# Document numbers freed by removals that trigger renumbering, as a fraction of all numbers
+_COMPACT_FRACTION = 0.25
+# Rows allocated for document lengths at first, doubled whenever full
+_INITIAL_DOCUMENTS = 1024
+# Room allocated for a new term's postings, doubled whenever full
+_INITIAL_POSTINGS = 4
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+class _Postings:
+    """Document numbers (row 0, ascending) and term frequencies (row 1) of one term.
+
+    Only the first `size` columns are used. Additions fill the spare columns, so
+    views of the used ones stay valid; anything else builds a new array.
+    """
+
+    __slots__ = ("array", "size")
+
+    def __init__(self, array: np.ndarray):
+        self.array = array
+        self.size = array.shape[1]
+
+    def append(self, columns: np.ndarray):
+        end = self.size + columns.shape[1]
+        if end > self.array.shape[1]:
+            grown = np.empty((2, max(end, 2 * self.array.shape[1], _INITIAL_POSTINGS)), dtype=np.int32)
+            grown[:, :self.size] = self.array[:, :self.size]
+            self.array = grown
+        self.array[:, self.size:end] = columns
+        self.size = end
+
+    def view(self) -> np.ndarray:
+        return self.array[:, :self.size]
+
+
+class BM25Snapshot:
+    """The postings of one query's terms and the document table they refer to.
+
+    Taken under the index lock in O(query terms); scoring it afterwards needs no
+    lock, because the index replaces these arrays instead of modifying them.
+    """
+
+    def __init__(self, postings: List[Tuple[float, np.ndarray]], lengths: np.ndarray,
+                 doc_ids: List[str], average_length: float, k1: float, b: float):
+        self.postings = postings
+        self.lengths = lengths
+        self.doc_ids = doc_ids
+        self.average_length = average_length
+        self.k1 = k1
+        self.b = b
+
+    def search(self, k: int, accept: Optional[Callable[[str], bool]] = None) -> List[Tuple[str, float]]:
+        """Top-k (docstore id, BM25 score) pairs, among the ids `accept` returns True for"""
+        if not self.postings:
+            return []
+        scores = np.zeros(len(self.lengths), dtype=np.float32)
+        for idf, posting in self.postings:
+            docs, frequencies = posting[0], posting[1].astype(np.float32)
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[docs] / self.average_length)
+            scores[docs] += idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+
+        candidates = np.flatnonzero(scores)
+        if accept is None and len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        results = []
+        for number in candidates.tolist():
+            id_ = self.doc_ids[number]
+            # Removed since the snapshot was taken
+            if not id_ or (accept is not None and not accept(id_)):
+                continue
+            results.append((id_, float(scores[number])))
+            if len(results) == k:
+                break
+        return results
+
+
+class BM25Index:
+    """In-memory inverted index scored with Okapi BM25.
+
+    Each term's postings are one (2, n) int32 array of document numbers (ascending)
+    and term frequencies, grown by doubling. Documents are numbered in insertion
+    order and referenced by their docstore id, so the index can be kept next to the
+    FAISS store and updated as chunks are added or removed. Stopwords are not indexed, and query
+    terms found in more than `max_document_frequency` of the documents are skipped.
+    Numbers of removed documents are reclaimed by renumbering once they make up
+    a quarter of the table.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, max_document_frequency: Optional[float] = None):
+        self.k1 = k1
+        self.b = b
+        self.max_document_frequency = (
+            settings.bm25_max_document_frequency if max_document_frequency is None else max_document_frequency
+        )
+        self.postings: Dict[str, _Postings] = {}
+        # Document number -> docstore id ("" once removed)
+        self.doc_ids: List[str] = []
+        self.doc_numbers: Dict[str, int] = {}
+        self.doc_lengths = np.zeros(_INITIAL_DOCUMENTS, dtype=np.float32)
+        self.num_documents = 0
+        self.total_length = 0
+        self._lock = threading.Lock()
+
+    def _append_document(self, id_: str, length: int) -> int:
+        number = len(self.doc_ids)
+        if number == len(self.doc_lengths):
+            # A new array, so snapshots keep reading the old one
+            grown = np.zeros(2 * len(self.doc_lengths), dtype=np.float32)
+            grown[:number] = self.doc_lengths
+            self.doc_lengths = grown
+        self.doc_lengths[number] = length
+        self.doc_ids.append(id_)
+        self.doc_numbers[id_] = number
+        self.num_documents += 1
+        self.total_length += length
+        return number
+
+    def add(self, ids: List[str], texts: List[str]):
+        with self._lock:
+            # Every token of the batch as (term number within the batch, document number)
+            terms: Dict[str, int] = defaultdict()
+            # A new term gets the next number
+            terms.default_factory = terms.__len__
+            token_terms: List[int] = []
+            token_documents: List[int] = []
+            for id_, text in zip(ids, texts):
+                tokens = tokenize(text)
+                number = self._append_document(id_, len(tokens))
+                token_terms.extend(map(terms.__getitem__, tokens))
+                token_documents.extend([number] * len(tokens))
+            if not terms:
+                return
+
+            # Distinct pairs sorted by term then document, with their counts as term frequencies
+            pairs, frequencies = np.unique(
+                np.array(token_terms, dtype=np.int64) << 32 | np.array(token_documents, dtype=np.int64),
+                return_counts=True
+            )
+            bounds = np.searchsorted(pairs >> 32, np.arange(len(terms) + 1)).tolist()
+            columns = np.stack([pairs & 0xFFFFFFFF, frequencies]).astype(np.int32)
+            for token, term in terms.items():
+                postings = self.postings.get(token)
+                if postings is None:
+                    postings = self.postings[token] = _Postings(np.empty((2, 0), dtype=np.int32))
+                postings.append(columns[:, bounds[term]:bounds[term + 1]])
+
+    def remove(self, documents: Dict[str, str]):
+        """Remove documents given as {docstore id: text} (the text says which postings to drop)"""
+        with self._lock:
+            removed: Dict[str, List[int]] = {}
+            for id_, text in documents.items():
+                number = self.doc_numbers.pop(id_, None)
+                if number is None:
+                    continue
+                for token in set(tokenize(text)):
+                    removed.setdefault(token, []).append(number)
+                self.doc_ids[number] = ""
+                self.num_documents -= 1
+                self.total_length -= int(self.doc_lengths[number])
+
+            for token, numbers in removed.items():
+                postings = self.postings.get(token)
+                if postings is None:
+                    continue
+                kept = postings.view()
+                kept = kept[:, ~np.isin(kept[0], numbers)]
+                if kept.shape[1]:
+                    self.postings[token] = _Postings(kept)
+                else:
+                    del self.postings[token]
+
+            if len(self.doc_ids) - self.num_documents > _COMPACT_FRACTION * len(self.doc_ids):
+                self._compact()
+
+    def _compact(self):
+        """Renumber the remaining documents 0..n-1 (call with the lock held)"""
+        alive = np.array([bool(id_) for id_ in self.doc_ids], dtype=bool)
+        new_numbers = np.cumsum(alive, dtype=np.int64) - 1
+        lengths = np.zeros(max(_INITIAL_DOCUMENTS, int(alive.sum())), dtype=np.float32)
+        lengths[:int(alive.sum())] = self.doc_lengths[:len(alive)][alive]
+
+        # Postings only hold remaining documents, and renumbering keeps them ascending
+        self.postings = {
+            token: _Postings(np.stack([new_numbers[postings.view()[0]].astype(np.int32), postings.view()[1]]))
+            for token, postings in self.postings.items()
+        }
+        self.doc_ids = [id_ for id_ in self.doc_ids if id_]
+        self.doc_numbers = {id_: number for number, id_ in enumerate(self.doc_ids)}
+        self.doc_lengths = lengths
+        logger.info(f"Compacted BM25 index to {len(self.doc_ids)} documents")
+
+    def clear(self):
+        with self._lock:
+            self.__init__(self.k1, self.b, self.max_document_frequency)
+
+    def _idf(self, document_frequency: int) -> float:
+        return math.log(1 + (self.num_documents - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def snapshot(self, query: str) -> BM25Snapshot:
+        """What scoring `query` needs, to search without holding any lock"""
+        with self._lock:
+            postings = []
+            if self.num_documents:
+                max_frequency = self.max_document_frequency * self.num_documents
+                for token in set(tokenize(query)):
+                    term = self.postings.get(token)
+                    if term is not None and term.size <= max_frequency:
+                        postings.append((self._idf(term.size), term.view()))
+            average_length = self.total_length / self.num_documents if self.num_documents else 0.0
+            return BM25Snapshot(
+                postings, self.doc_lengths[:len(self.doc_ids)], self.doc_ids, average_length, self.k1, self.b
+            )
+
+    def search(self, query: str, k: int, accept: Optional[Callable[[str], bool]] = None) -> List[Tuple[str, float]]:
+        """Top-k (docstore id, BM25 score) pairs for a query, among the ids `accept` returns True for"""
+        return self.snapshot(query).search(k, accept)
+
+    def nbytes(self) -> int:
+        """Bytes held by the postings and document lengths"""
+        return sum(postings.array.nbytes for postings in self.postings.values()) + self.doc_lengths.nbytes
+
+    def __len__(self) -> int:
+        return self.num_documents
+
+    @classmethod
+    def from_documents(cls, items: Iterable[Tuple[str, str]]) -> "BM25Index":
+        """Build an index from (docstore id, text) pairs"""
+        index = cls()
+        ids, texts = [], []
+        for id_, text in items:
+            ids.append(id_)
+            texts.append(text)
+        index.add(ids, texts)
+        logger.info(f"Built BM25 index over {len(ids)} chunks")
+        return index
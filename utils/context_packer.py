@@ -0,0 +1,149 @@
+import re
+import logging
+from typing import List, Optional, Tuple
+from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+# Rough size of a token in characters, good enough to budget a prompt without the model's tokenizer
+CHARS_PER_TOKEN = 4
+
+# Overlaps shorter than this are treated as coincidence, not as text shared by neighbouring chunks
+_MIN_OVERLAP_CHARS = 30
+
+# Lines shorter than this (table headers, "Page 3", ...) are never removed as duplicates
+_MIN_DUPLICATE_LINE_CHARS = 50
+
+_SEPARATOR = "\n\n"
+_WHITESPACE = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _overlap(first: str, second: str) -> int:
+    """Length of the longest suffix of `first` that is a prefix of `second`"""
+    if len(first) < _MIN_OVERLAP_CHARS or len(second) < _MIN_OVERLAP_CHARS:
+        return 0
+    anchor = second[:_MIN_OVERLAP_CHARS]
+    start = max(0, len(first) - len(second))
+    position = first.find(anchor, start)
+    while position != -1:
+        if second.startswith(first[position:]):
+            return len(first) - position
+        position = first.find(anchor, position + 1)
+    return 0
+
+
+def _merge(first: str, second: str) -> Optional[str]:
+    """Text covering both chunks if one contains the other or they overlap, otherwise None"""
+    if second in first:
+        return first
+    if first in second:
+        return second
+    overlap = _overlap(first, second)
+    if overlap:
+        return first + second[overlap:]
+    overlap = _overlap(second, first)
+    if overlap:
+        return second + first[overlap:]
+    return None
+
+
+class _Span:
+    """Merged text of one or more chunks from the same source and page"""
+
+    def __init__(self, doc: Document, rank: int):
+        self.text = doc.page_content.strip()
+        self.docs = [doc]
+        self.rank = rank
+        self.key = (doc.metadata.get("source"), doc.metadata.get("page"))
+
+    def absorb(self, other: "_Span") -> bool:
+        merged = _merge(self.text, other.text)
+        if merged is None:
+            return False
+        self.text = merged
+        self.docs.extend(other.docs)
+        self.rank = min(self.rank, other.rank)
+        return True
+
+
+def _merge_spans(docs: List[Document]) -> List[_Span]:
+    spans: List[_Span] = []
+    for rank, doc in enumerate(docs):
+        span = _Span(doc, rank)
+        # A merged span can overlap another one, so keep merging until nothing changes
+        while True:
+            match = next((other for other in spans if other.key == span.key and span.absorb(other)), None)
+            if match is None:
+                break
+            spans.remove(match)
+        spans.append(span)
+    return sorted(spans, key=lambda span: span.rank)
+
+
+def _drop_duplicates(spans: List[_Span]):
+    """Empty spans contained in a better ranked one and remove their long lines already seen"""
+    seen = set()
+    for i, span in enumerate(spans):
+        if any(span.text in better.text for better in spans[:i]):
+            span.text = ""
+            continue
+        lines = []
+        for line in span.text.split("\n"):
+            normalized = _WHITESPACE.sub(" ", line).strip()
+            if len(normalized) >= _MIN_DUPLICATE_LINE_CHARS:
+                if normalized in seen:
+                    continue
+                seen.add(normalized)
+            lines.append(line)
+        span.text = "\n".join(lines).strip()
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    """Cut text at the last whitespace before max_chars"""
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars)
+    return text[:cut if cut > 0 else max_chars].rstrip()
+
+
+def pack_context(docs: List[Document], token_budget: int) -> Tuple[str, List[Document]]:
+    """Build prompt context from retrieved chunks, best first.
+
+    Chunks from the same source and page that overlap (the splitter repeats
+    `chunk_overlap` characters between neighbours) or contain one another are
+    merged, chunks or long lines already present in a better ranked chunk
+    (e.g. the same page in two uploaded files) are removed,
+    then the merged texts are added in rank order while they fit `token_budget`.
+    The best one is truncated if it does not fit on its own.
+
+    Returns the context and the chunks it includes.
+    """
+    spans = _merge_spans(docs)
+    _drop_duplicates(spans)
+
+    max_chars = token_budget * CHARS_PER_TOKEN
+    parts, included, used = [], [], 0
+    for span in spans:
+        if not span.text:
+            continue
+        cost = len(span.text) + (len(_SEPARATOR) if parts else 0)
+        if used + cost <= max_chars:
+            parts.append(span.text)
+        elif not parts:
+            parts.append(_truncate(span.text, max_chars))
+        else:
+            continue
+        used += cost
+        included.extend(span.docs)
+
+    context = _SEPARATOR.join(parts)
+    original_tokens = sum(estimate_tokens(doc.page_content) for doc in docs)
+    logger.info(
+        f"Packed {len(docs)} chunks into {len(parts)} passages, "
+        f"~{estimate_tokens(context)} tokens (from ~{original_tokens})"
+    )
+    return context, included
@@ -0,0 +1,112 @@
+import time
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CrewPool:
+    """Crews built once and reused, one request at a time per instance.
+
+    Building a crew parses its YAML configs, creates its agents and tasks and,
+    for crews with `mcp_server_params`, connects to the MCP servers to discover
+    their tools. A pooled crew keeps all of that between requests: `kickoff`
+    interpolates each request's inputs into the original task templates again.
+
+    `acquire` hands out an idle instance for a key (building one if there is
+    none) and takes it back afterwards; up to `max_idle` instances per key are
+    kept. An instance whose request failed is discarded, so a broken MCP
+    connection is rebuilt on the next request. crewai caches tool results per
+    crew; a reused instance starts with an empty cache, so MCP tools are
+    called again for every request.
+    """
+
+    def __init__(self, max_idle: Optional[int] = None):
+        self.max_idle = settings.crew_pool_size if max_idle is None else max_idle
+        self.builds = 0
+        self.reuses = 0
+        self.build_seconds = 0.0
+
+        self._idle: Dict[Hashable, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def _build(self, factory: Callable[[], Any]) -> Any:
+        start = time.perf_counter()
+        instance = factory()
+        # CrewBase stops the MCP adapter after every kickoff; pooled crews keep their tools connected
+        instance._after_kickoff.pop("_close_mcp_server", None)
+        instance.crew()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.builds += 1
+            self.build_seconds += elapsed
+        logger.info(f"Built {type(instance).__name__} in {elapsed:.2f}s")
+        return instance
+
+    @staticmethod
+    def _close(instance: Any):
+        adapter = getattr(instance, "_mcp_server_adapter", None)
+        if adapter is not None:
+            try:
+                adapter.stop()
+            except Exception as e:
+                logger.warning(f"Error stopping MCP server adapter: {e}")
+
+    @staticmethod
+    def _clear_tool_cache(instance: Any):
+        crew = instance.crew()
+        crew._cache_handler._cache.clear()
+        for agent in crew.agents:
+            if agent.cache_handler is not None:
+                agent.cache_handler._cache.clear()
+
+    @contextmanager
+    def acquire(self, key: Hashable, factory: Callable[[], Any]) -> Iterator[Any]:
+        """Crew instance for `key` (a CrewBase object, `.crew()` returns its built Crew)"""
+        with self._lock:
+            idle = self._idle.get(key)
+            instance = idle.pop() if idle else None
+            if instance is not None:
+                self.reuses += 1
+        if instance is None:
+            instance = self._build(factory)
+        else:
+            self._clear_tool_cache(instance)
+
+        try:
+            yield instance
+        except BaseException:
+            self._close(instance)
+            raise
+
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(instance)
+                return
+        self._close(instance)
+
+    def close(self):
+        """Stop the MCP connections of all idle crews"""
+        with self._lock:
+            instances = [instance for idle in self._idle.values() for instance in idle]
+            self._idle.clear()
+        for instance in instances:
+            self._close(instance)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "builds": self.builds,
+            "reuses": self.reuses,
+            "build_seconds": self.build_seconds,
+            "idle": sum(len(idle) for idle in self._idle.values()),
+        }
+
+
+# Shared by all flows of the process
+crew_pool = CrewPool()
+atexit.register(crew_pool.close)
@@ -1,6 +1,10 @@
 import os
 import logging
-from typing import List, Dict, Any
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from itertools import islice
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import PyPDF2
 import pdfplumber
 import pandas as pd
@@ -10,6 +14,118 @@ from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+
+def _iter_pages(pdf, start: int, end: int) -> Iterator[Tuple[int, Optional[str]]]:
+    """Extract the text of pages [start, end) from an open pdfplumber document.
+
+    A page that pdfplumber cannot parse is yielded with None as its text so the
+    caller can retry just that page with PyPDF2.
+    """
+    for page_num in range(start, end):
+        try:
+            page = pdf.pages[page_num]
+            text = page.extract_text() or ""
+            # Drop the parsed layout objects, they are not needed once the text is out
+            page.close()
+        except Exception as e:
+            logger.warning(f"pdfplumber failed on page {page_num + 1}: {e}")
+            text = None
+        yield page_num, text
+
+
+def _extract_pdf_page_range(file_path: str, start: int, end: int) -> List[Tuple[int, Optional[str]]]:
+    """Extract a page range in a worker process (must stay picklable at module level)"""
+    with pdfplumber.open(file_path) as pdf:
+        return list(_iter_pages(pdf, start, end))
+
+
+class _PyPDF2Fallback:
+    """PyPDF2 reader opened on first use, for the pages pdfplumber could not read"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._file = None
+        self._reader = None
+
+    @property
+    def reader(self) -> PyPDF2.PdfReader:
+        if self._reader is None:
+            self._file = open(self.file_path, 'rb')
+            self._reader = PyPDF2.PdfReader(self._file)
+        return self._reader
+
+    def extract(self, page_num: int) -> str:
+        try:
+            return self.reader.pages[page_num].extract_text() or ""
+        except Exception as e:
+            logger.warning(f"PyPDF2 failed on page {page_num + 1}: {e}")
+            return ""
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class _RunningStats:
+    """count/mean/std/min/max of the numeric columns, merged chunk by chunk.
+
+    Means and variances are combined with Chan et al.'s pairwise update, so the
+    result matches a single pass over the whole file. Quantiles are not
+    mergeable and are left out.
+    """
+
+    def __init__(self):
+        self.stats: Optional[pd.DataFrame] = None
+
+    def update(self, df: pd.DataFrame):
+        numeric = df.select_dtypes(include="number")
+        if numeric.empty:
+            return
+
+        count = numeric.count()
+        chunk = pd.DataFrame({
+            "count": count,
+            "mean": numeric.mean(),
+            "m2": numeric.var(ddof=0) * count,
+            "min": numeric.min(),
+            "max": numeric.max(),
+        })
+        if self.stats is None:
+            self.stats = chunk
+            return
+
+        index = self.stats.index.union(chunk.index, sort=False)
+        a = self.stats.reindex(index)
+        b = chunk.reindex(index)
+        a["count"] = a["count"].fillna(0)
+        b["count"] = b["count"].fillna(0)
+
+        n = a["count"] + b["count"]
+        delta = b["mean"].fillna(a["mean"]) - a["mean"].fillna(b["mean"])
+        weight = (b["count"] / n.where(n > 0)).fillna(0)
+        self.stats = pd.DataFrame({
+            "count": n,
+            "mean": a["mean"].fillna(b["mean"]) + delta * weight,
+            "m2": a["m2"].fillna(0) + b["m2"].fillna(0) + delta ** 2 * a["count"] * weight,
+            "min": pd.concat([a["min"], b["min"]], axis=1).min(axis=1),
+            "max": pd.concat([a["max"], b["max"]], axis=1).max(axis=1),
+        })
+
+    def describe(self) -> pd.DataFrame:
+        """Same layout as DataFrame.describe() (statistics as rows, columns as columns)"""
+        if self.stats is None:
+            return pd.DataFrame()
+        count = self.stats["count"]
+        std = (self.stats["m2"] / (count - 1).where(count > 1)) ** 0.5
+        return pd.DataFrame({
+            "count": count,
+            "mean": self.stats["mean"],
+            "std": std,
+            "min": self.stats["min"],
+            "max": self.stats["max"],
+        }).T
+
+
 class DocumentLoader:
     """Handles document loading and processing"""
 
@@ -20,104 +136,240 @@ class DocumentLoader:
             length_function=len,
         )
     
-    def load_pdf(self, file_path: str) -> List[Document]:
-        """Load and process PDF files"""
-        documents = []
+    def settings_fingerprint(self) -> Dict[str, Any]:
+        """Settings that change the chunks produced for a file (used as part of cache keys)"""
+        return {
+            "chunk_size": settings.chunk_size,
+            "chunk_overlap": settings.chunk_overlap,
+            "csv_chunked_min_mb": settings.csv_chunked_min_mb,
+            "csv_read_chunksize": settings.csv_read_chunksize,
+            "csv_serialization": settings.csv_serialization,
+            "csv_rows_per_chunk": settings.csv_rows_per_chunk,
+            "embedding_model": settings.embedding_model,
+            "embedding_backend": settings.embedding_backend,
+            # Each quantized ONNX export embeds slightly differently
+            "embedding_onnx_int8_file": (
+                settings.embedding_onnx_int8_file if settings.embedding_backend == "onnx-int8" else None
+            ),
+        }
+
+    @staticmethod
+    def _pdf_workers() -> int:
+        # More processes than CPUs only adds start-up cost
+        return min(settings.pdf_extraction_workers, os.cpu_count() or 1)
+
+    def _pdf_page_ranges(self, num_pages: int) -> List[Tuple[int, int]]:
+        """Split a PDF into page ranges for the worker pool (a single range means serial)"""
+        workers = self._pdf_workers()
+        if workers <= 1 or num_pages < settings.pdf_parallel_min_pages:
+            return [(0, num_pages)]
+
+        # A few ranges per worker keeps the pool busy when some pages are much heavier than others
+        num_ranges = min(num_pages, workers * 4)
+        step = -(-num_pages // num_ranges)
+        return [(start, min(start + step, num_pages)) for start in range(0, num_pages, step)]
+
+    def _make_pdf_document(self, file_path: str, page_num: int, text: str, extractor: str) -> Document:
+        return Document(
+            page_content=text,
+            metadata = {
+                "source": os.path.basename(file_path),
+                "page": page_num + 1,
+                "type": "pdf",
+                "extractor": extractor
+            }
+        )
+
+    def _iter_pdfplumber_pages(self, file_path: str) -> Iterator[Tuple[int, Optional[str]]]:
+        """Yield (page_num, text) in page order with pdfplumber, in parallel for large files"""
+        with pdfplumber.open(file_path) as pdf:
+            num_pages = len(pdf.pages)
+            ranges = self._pdf_page_ranges(num_pages)
+            if len(ranges) == 1:
+                yield from _iter_pages(pdf, 0, num_pages)
+                return
+
+        # Large PDF: extract page ranges in parallel, yielded in page order. Only
+        # two ranges per worker are in flight, so extracted text waiting for a
+        # slow consumer stays bounded however many pages the file has.
+        workers = min(self._pdf_workers(), len(ranges))
+        pending = iter(ranges)
+        # Spawned, not forked: forking the multithreaded app can copy a held lock into the child and hang it
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            in_flight = deque(
+                executor.submit(_extract_pdf_page_range, file_path, start, end)
+                for start, end in islice(pending, 2 * workers)
+            )
+            while in_flight:
+                page_texts = in_flight.popleft().result()
+                for start, end in islice(pending, 1):
+                    in_flight.append(executor.submit(_extract_pdf_page_range, file_path, start, end))
+                yield from page_texts
+        logger.info(f"Extracted {num_pages} pages with {workers} workers")
+
+    def iter_pdf(self, file_path: str) -> Iterator[Document]:
+        """Yield PDF pages one at a time, in page order.
+
+        Pages are extracted with pdfplumber; only the pages it fails on are
+        re-extracted with PyPDF2. The extractor used is recorded per page.
+        """
+        fallback = _PyPDF2Fallback(file_path)
+        next_page = 0
 
         try:
             # Using pdfplumber for comples PDFs
-            with pdfplumber.open(file_path) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    text = page.extract_text()
+            try:
+                for page_num, text in self._iter_pdfplumber_pages(file_path):
+                    extractor = "pdfplumber"
+                    if text is None:
+                        text, extractor = fallback.extract(page_num), "pypdf2"
+                    next_page = page_num + 1
                     if text:
-                        documents.append(
-                            Document(
-                                page_content=text,
-                                metadata = {
-                                    "source": os.path.basename(file_path),
-                                    "page": page_num + 1,
-                                    "type": "pdf"
-                                }
-                            )
-                        )
-            logger.info(f"Loaded PDF with pdfplumber: {file_path}")
-        except Exception as e:
-            logger.warning(f"pdfplumber failed, trying PyPDF2: {e}")
+                        yield self._make_pdf_document(file_path, page_num, text, extractor)
+                logger.info(f"Loaded PDF with pdfplumber: {file_path}")
+                return
+            except Exception as e:
+                logger.warning(f"pdfplumber failed, trying PyPDF2 from page {next_page + 1}: {e}")
 
-            # Using PyPDF2
+            # Using PyPDF2 for the pages pdfplumber did not get to
             try:
-                with open(file_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    for page_num, page in enumerate(pdf_reader.pages):
-                        text = page.extract_text()
-                        if text:
-                            documents.append(
-                                Document(
-                                    page_content=text,
-                                    metadata = {
-                                        "source": os.path.basename(file_path),
-                                        "page": page_num + 1,
-                                        "type": "pdf"
-                                    }
-                                )
-                            )
-                logger.info(f"Loaded PDF with PyPDF2: {file_path}")
+                num_pages = len(fallback.reader.pages)
             except Exception as e2:
                 logger.warning(f"Failed to load PDF: {e2}")
                 raise
-        
-        return documents
+            for page_num in range(next_page, num_pages):
+                text = fallback.extract(page_num)
+                if text:
+                    yield self._make_pdf_document(file_path, page_num, text, "pypdf2")
+            logger.info(f"Loaded PDF with PyPDF2: {file_path}")
+        finally:
+            fallback.close()
+
+    def load_pdf(self, file_path: str) -> List[Document]:
+        """Load and process PDF files"""
+        return list(self.iter_pdf(file_path))
     
-    def load_csv(self, file_path: str) -> List[Document]:
-        """Load and process CSV files"""
-        documents = []
+    @staticmethod
+    def _escape_cells(cells: pd.Series, sep: str) -> pd.Series:
+        """Quote (csv) or escape (pipe) cells so every row stays on one line"""
+        cells = cells.str.replace(r"[\r\n]+", " ", regex=True)
+        if sep == ",":
+            needs_quotes = cells.str.contains('[",]', regex=True)
+            return cells.where(~needs_quotes, '"' + cells.str.replace('"', '""', regex=False) + '"')
+        return cells.str.replace("|", "\\|", regex=False)
 
-        try:
-            df = pd.read_csv(file_path)
-
-            # Create a summary document
-            summary = f"CSV File: {os.path.basename(file_path)}\n"
-            summary += f"Columns: {', '.join(df.columns)}\n"
-            summary += f"Total Rows: {len(df)}\n\n"
-            summary += f"Data Summary:\n{df.describe().to_string()}\n\n"
-
-            documents.append(
-                Document(
-                    page_content=summary,
-                    metadata={
-                        "source": os.path.basename(file_path),
-                        "type": "cvs",
-                        "rows": len(df),
-                        "columns": len(df.columns)
-                    }
-                )
-            )
+    def _serialize_rows(self, df: pd.DataFrame, sep: str) -> pd.Series:
+        """One delimited line per row, built column by column (vectorized over the rows)"""
+        columns = []
+        for i in range(df.shape[1]):
+            col = df.iloc[:, i]
+            if pd.api.types.is_float_dtype(col):
+                # Six decimals is plenty for figures and avoids the float repr noise
+                col = col.round(6)
+            cells = col.astype(str).where(col.notna(), "")
+            columns.append(self._escape_cells(cells, sep))
+
+        if not columns:
+            return pd.Series([""] * len(df), index=df.index)
+        if len(columns) == 1:
+            return columns[0]
+        return columns[0].str.cat(columns[1:], sep=sep)
+
+    def _csv_row_documents(self, file_path: str, df: pd.DataFrame, offset: int = 0) -> Iterator[Document]:
+        """Convert rows to text documents (in chunks), `offset` is the row number of df's first row.
+
+        With `csv_serialization` set to "csv" or "pipe" the header is written once
+        per chunk followed by one unpadded line per row, which is much shorter than
+        the column-aligned "table" layout of DataFrame.to_string.
+        """
+        chunk_size = settings.csv_rows_per_chunk
+        sep = {"csv": ",", "pipe": "|"}.get(settings.csv_serialization)
+        if sep is not None:
+            header = sep.join(self._escape_cells(pd.Series(df.columns.astype(str)), sep))
+            lines = self._serialize_rows(df, sep).tolist()
 
-            # Convert rows to text documents (in chunks)
-            chunk_size = 50
-            for i in range(0, len(df), chunk_size):
+        for i in range(0, len(df), chunk_size):
+            if sep is not None:
+                block = lines[i:i+chunk_size]
+                num_rows = len(block)
+                body = header + "\n" + "\n".join(block)
+            else:
                 chunk = df.iloc[i:i+chunk_size]
-                text = f"Data from {os.path.basename(file_path)} (rows {i+1}-{i+len(chunk)}):\n"
-                text += chunk.to_string(index=False)
-
-                documents.append(
-                    Document(
-                        page_content=text,
-                        metadata={
-                            "source": os.path.basename(file_path),
-                            "type": "csv_chunk",
-                            "chunk_start": i,
-                            "chunk_end": i + len(chunk)
-                        }
-                    )
-                )
-            
+                num_rows = len(chunk)
+                body = chunk.to_string(index=False)
+
+            start = offset + i
+            text = f"Data from {os.path.basename(file_path)} (rows {start+1}-{start+num_rows}):\n"
+            text += body
+
+            yield Document(
+                page_content=text,
+                metadata={
+                    "source": os.path.basename(file_path),
+                    "type": "csv_chunk",
+                    "chunk_start": start,
+                    "chunk_end": start + num_rows
+                }
+            )
+
+    def _csv_summary_document(self, file_path: str, columns: List[str], num_rows: int, stats: str) -> Document:
+        summary = f"CSV File: {os.path.basename(file_path)}\n"
+        summary += f"Columns: {', '.join(columns)}\n"
+        summary += f"Total Rows: {num_rows}\n\n"
+        summary += f"Data Summary:\n{stats}\n\n"
+
+        return Document(
+            page_content=summary,
+            metadata={
+                "source": os.path.basename(file_path),
+                "type": "cvs",
+                "rows": num_rows,
+                "columns": len(columns)
+            }
+        )
+
+    def iter_csv(self, file_path: str) -> Iterator[Document]:
+        """Yield the summary and row-chunk documents of a CSV file.
+
+        Files above `csv_chunked_min_mb` are read `csv_read_chunksize` rows at a
+        time: row chunks are emitted as they are read and the summary, built from
+        incrementally merged statistics, comes last.
+        """
+        try:
+            if os.path.getsize(file_path) < settings.csv_chunked_min_mb * 1024 * 1024:
+                df = pd.read_csv(file_path)
+                yield self._csv_summary_document(file_path, list(df.columns), len(df), df.describe().to_string())
+                yield from self._csv_row_documents(file_path, df)
+            else:
+                yield from self._iter_csv_chunked(file_path)
+
             logger.info(f"Loaded CSV: {file_path}")
         except Exception as e:
             logger.error(f"Failed to load CSV: {e}")
             raise
 
-        return documents
+    def _iter_csv_chunked(self, file_path: str) -> Iterator[Document]:
+        stats = _RunningStats()
+        columns: List[str] = []
+        num_rows = 0
+
+        # Keep read chunks aligned on the row-chunk documents
+        rows_per_chunk = settings.csv_rows_per_chunk
+        chunksize = max(rows_per_chunk, settings.csv_read_chunksize // rows_per_chunk * rows_per_chunk)
+        with pd.read_csv(file_path, chunksize=chunksize) as reader:
+            for df in reader:
+                columns = list(df.columns)
+                stats.update(df)
+                yield from self._csv_row_documents(file_path, df, offset=num_rows)
+                num_rows += len(df)
+
+        logger.info(f"Streamed {num_rows} CSV rows in chunks of {chunksize}")
+        yield self._csv_summary_document(file_path, columns, num_rows, stats.describe().to_string())
+
+    def load_csv(self, file_path: str) -> List[Document]:
+        """Load and process CSV files"""
+        return list(self.iter_csv(file_path))
     
     def process_documents(self, documents: List[Document]) -> List[Document]:
         """Split documents into chunks"""
@@ -129,15 +381,27 @@ class DocumentLoader:
             logger.error(f"Failed to process documents: {e}")
             raise
 
-    def load_file(self, file_path: str) -> List[Document]:
-        """Load file based on extension"""
+    def iter_pages(self, file_path: str) -> Iterator[Document]:
+        """Yield the raw page/row documents of a file based on extension"""
         ext = os.path.splitext(file_path)[1].lower()
 
         if ext == '.pdf':
-            docs = self.load_pdf(file_path)
+            return self.iter_pdf(file_path)
         elif ext == '.csv':
-            docs = self.load_csv(file_path)
+            return self.iter_csv(file_path)
         else:
             raise ValueError(f"Unsupported file type: {ext}")
-        
-        return self.process_documents(docs)
\ No newline at end of file
+
+    def iter_chunks(self, file_path: str) -> Iterator[Document]:
+        """Yield chunks as pages are extracted, without holding the whole file in memory"""
+        num_chunks = 0
+        for page in self.iter_pages(file_path):
+            chunks = self.text_splitter.split_documents([page])
+            num_chunks += len(chunks)
+            yield from chunks
+        logger.info(f"Split {os.path.basename(file_path)} into {num_chunks} chunks")
+
+    def load_file(self, file_path: str) -> List[Document]:
+        """Load file based on extension"""
+        docs = list(self.iter_pages(file_path))
+        return self.process_documents(docs)
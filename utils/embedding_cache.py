@@ -0,0 +1,138 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+from langchain.embeddings.base import Embeddings
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of bound parameters per statement
+_SQL_BATCH = 500
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper backed by a persistent SQLite cache.
+
+    Vectors are keyed by model name plus the hash of the whitespace-normalized
+    text, so boilerplate chunks and re-uploads are only embedded once. The least
+    recently used entries are evicted when the cache grows past `max_mb`.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        db_path: Optional[str] = None,
+        max_mb: Optional[int] = None
+    ):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.db_path = db_path or os.path.join(settings.processed_dir, "embedding_cache.sqlite")
+        self.max_bytes = (max_mb or settings.embedding_cache_max_mb) * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings (last_access)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def _key(self, text: str, kind: str) -> str:
+        normalized = re.sub(r"\s+", " ", text).strip()
+        return hashlib.sha256(f"{self.model_name}\0{kind}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        for i in range(0, len(keys), _SQL_BATCH):
+            batch = keys[i:i + _SQL_BATCH]
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                batch
+            ).fetchall()
+            found.update({key: np.frombuffer(vector, dtype=np.float32).tolist() for key, vector in rows})
+
+        # Refresh the LRU position of the hits
+        now = time.time()
+        self._conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, key) for key in found])
+        return found
+
+    def _store(self, vectors: Dict[str, List[float]]):
+        now = time.time()
+        rows = [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in vectors.items()]
+        self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+        self._size += sum(len(row[1]) for row in rows)
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries down to 90% of the size cap"""
+        total, count = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0), COUNT(*) FROM embeddings"
+        ).fetchone()
+        if total > self.max_bytes and count:
+            excess = total - int(self.max_bytes * 0.9)
+            num_rows = min(count, -(-excess * count // total))
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+                (num_rows,)
+            )
+            logger.info(f"Evicted {num_rows} embeddings from cache")
+        self._size = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def _embed(self, texts: List[str], kind: str) -> List[List[float]]:
+        keys = [self._key(text, kind) for text in texts]
+
+        with self._lock:
+            found = self._lookup(list(set(keys)))
+            self._conn.commit()
+
+        # Embed each missing text once, even if it appears several times in the batch
+        missing = {}
+        num_missing = 0
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+                num_missing += 1
+
+        if missing:
+            if kind == "query":
+                computed = [self.embeddings.embed_query(text) for text in missing.values()]
+            else:
+                computed = self.embeddings.embed_documents(list(missing.values()))
+            new_vectors = dict(zip(missing.keys(), computed))
+            with self._lock:
+                self._store(new_vectors)
+                self._conn.commit()
+            found.update(new_vectors)
+
+        self.hits += len(texts) - num_missing
+        self.misses += num_missing
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "document")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], "query")[0]
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size_mb": self._size / (1024 * 1024),
+        }
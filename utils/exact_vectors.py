@@ -0,0 +1,177 @@
+import os
+import threading
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+
+# Rows allocated at first, doubled whenever the array is full
+_INITIAL_ROWS = 1024
+# Rows copied at a time when writing the saved file
+_WRITE_BATCH = 10000
+
+_IDS_FILE = "exact_ids.npy"
+_VECTORS_FILE = "exact_vectors.npy"
+
+
+class ExactVectors:
+    """Uncompressed copies of indexed vectors by docstore id, to re-rank compressed search results.
+
+    Vectors are kept as float16: half the size of float32, and far more precise than
+    the PQ or int8 codes whose candidates they re-order. Copies written with a base
+    index are read from memory-mapped files next to it, so they cost disk and page
+    cache rather than process memory:
+        exact_ids.npy       docstore ids, sorted
+        exact_vectors.npy   float16 vector of each id, in the same order
+
+    Only vectors added since (new chunks, chunks re-ranked for the first time) are
+    held in memory, in one growing array whose rows of removed ids are reused,
+    until the next base is written and `rebased` drops them.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._vectors: Optional[np.ndarray] = None
+        self._num_rows = 0
+        self._lock = threading.Lock()
+
+        self._saved_ids = np.empty(0, dtype="S1")
+        self._saved: Optional[np.ndarray] = None
+        # Saved ids removed since the files were written
+        self._removed = set()
+        if path is not None and self.exists(path):
+            self._saved = np.load(os.path.join(path, _VECTORS_FILE), mmap_mode='r')
+            self._saved_ids = np.load(os.path.join(path, _IDS_FILE), mmap_mode='r')
+        # Identifies the copies a snapshot can be rebased from
+        self._generation = object()
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, _IDS_FILE))
+
+    def _saved_row(self, id_: str) -> Optional[int]:
+        key = id_.encode("utf-8")
+        i = int(np.searchsorted(self._saved_ids, key))
+        if i < len(self._saved_ids) and self._saved_ids[i] == key and id_ not in self._removed:
+            return i
+        return None
+
+    def __len__(self) -> int:
+        return len(self._rows) + len(self._saved_ids) - len(self._removed)
+
+    def __contains__(self, id_: str) -> bool:
+        return id_ in self._rows or self._saved_row(id_) is not None
+
+    def memory_bytes(self) -> int:
+        """Bytes held in process memory (the vectors not written with a base yet)"""
+        return self._vectors.nbytes if self._vectors is not None else 0
+
+    def nbytes(self) -> int:
+        """Bytes of all copies, in memory and on disk"""
+        dim = self._dimension()
+        return 0 if dim is None else len(self) * dim * 2
+
+    def _dimension(self) -> Optional[int]:
+        if self._vectors is not None:
+            return self._vectors.shape[1]
+        if self._saved is not None:
+            return self._saved.shape[1]
+        return None
+
+    def _new_row(self, dim: int) -> int:
+        if self._free:
+            return self._free.pop()
+        if self._vectors is None:
+            self._vectors = np.empty((_INITIAL_ROWS, dim), dtype=np.float16)
+        elif self._num_rows == len(self._vectors):
+            grown = np.empty((2 * len(self._vectors), dim), dtype=np.float16)
+            grown[:self._num_rows] = self._vectors
+            self._vectors = grown
+        self._num_rows += 1
+        return self._num_rows - 1
+
+    def add(self, ids: Iterable[str], vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float16)
+        with self._lock:
+            for id_, vector in zip(ids, vectors):
+                row = self._rows.get(id_)
+                if row is None:
+                    row = self._new_row(vectors.shape[1])
+                    self._rows[id_] = row
+                self._vectors[row] = vector
+
+    def remove(self, ids: Iterable[str]):
+        with self._lock:
+            for id_ in ids:
+                row = self._rows.pop(id_, None)
+                if row is not None:
+                    self._free.append(row)
+                if self._saved_row(id_) is not None:
+                    self._removed.add(id_)
+
+    def _get16(self, ids: List[str]) -> np.ndarray:
+        vectors = np.empty((len(ids), self._dimension()), dtype=np.float16)
+        for i, id_ in enumerate(ids):
+            row = self._rows.get(id_)
+            vectors[i] = self._vectors[row] if row is not None else self._saved[self._saved_row(id_)]
+        return vectors
+
+    def get(self, ids: List[str]) -> np.ndarray:
+        """float32 vectors of ids that are all present"""
+        with self._lock:
+            return self._get16(ids).astype(np.float32)
+
+    def clear(self):
+        with self._lock:
+            self._rows = {}
+            self._free = []
+            self._vectors = None
+            self._num_rows = 0
+            self._saved_ids = np.empty(0, dtype="S1")
+            self._saved = None
+            self._removed = set()
+            self._generation = object()
+
+    def copy(self) -> "ExactVectors":
+        """Snapshot sharing the saved files; the in-memory vectors are copied"""
+        with self._lock:
+            snapshot = ExactVectors.__new__(ExactVectors)
+            snapshot.__dict__.update(self.__dict__)
+            snapshot._lock = threading.Lock()
+            snapshot._rows = dict(self._rows)
+            snapshot._free = list(self._free)
+            snapshot._vectors = self._vectors.copy() if self._vectors is not None else None
+            snapshot._removed = set(self._removed)
+            return snapshot
+
+    def write(self, path: str, ids: Iterable[str]):
+        """Write the vectors of `ids` (those present) as the saved files of a base at `path`"""
+        present = sorted(id_ for id_ in ids if id_ in self)
+        dim = self._dimension()
+        if not present or dim is None:
+            return
+        tmp_path = os.path.join(path, _VECTORS_FILE + ".tmp")
+        vectors = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float16, shape=(len(present), dim))
+        for start in range(0, len(present), _WRITE_BATCH):
+            vectors[start:start + _WRITE_BATCH] = self._get16(present[start:start + _WRITE_BATCH])
+        vectors.flush()
+        del vectors
+        os.replace(tmp_path, os.path.join(path, _VECTORS_FILE))
+        # Written last: its presence marks complete files
+        np.save(os.path.join(path, _IDS_FILE), np.array([id_.encode("utf-8") for id_ in present], dtype=bytes))
+
+    def rebased(self, path: str, snapshot: "ExactVectors") -> Optional["ExactVectors"]:
+        """The same copies read from files written at `path` from `snapshot`.
+
+        `snapshot` is a copy() taken earlier; vectors added and removed since are
+        carried over. Returns None if the snapshot was not taken from these copies.
+        """
+        if snapshot._generation is not self._generation:
+            return None
+        with self._lock:
+            rebased = ExactVectors(path)
+            added = [id_ for id_ in self._rows if id_ not in snapshot._rows]
+            if added:
+                rebased.add(added, self._get16(added))
+            removed = (self._removed - snapshot._removed) | (snapshot._rows.keys() - self._rows.keys())
+        rebased.remove(removed)
+        return rebased
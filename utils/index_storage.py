@@ -0,0 +1,212 @@
+import os
+import re
+import json
+import shutil
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+import faiss
+import numpy as np
+from langchain.schema import Document
+from langchain_community.vectorstores import FAISS
+from langchain.embeddings.base import Embeddings
+from utils import ann_index
+from utils.exact_vectors import ExactVectors
+from utils.mmap_docstore import MmapDocstore
+
+logger = logging.getLogger(__name__)
+
+_SEGMENT_PATTERN = re.compile(r"^seg_(\d+)\.jsonl$")
+
+
+class IndexStorage:
+    """On-disk layout of the vector store: a base snapshot plus append-only segments.
+
+    index_path/
+        manifest.json           {"base": "base_000002", "version": 2, "segment": 7}
+        base_000002/            full snapshot: index.faiss plus a memory-mapped docstore
+                                (and exact vector copies, for re-ranking a compressed index)
+        segments/seg_000008.*   vectors (.npy) and records (.jsonl) added or deleted since
+
+    The manifest says which base is current and the last segment merged into it;
+    it is swapped atomically, so a crash during compaction leaves the previous
+    base and its segments intact. Bases pickled by `save_local` (index.pkl) and
+    a store saved directly in index_path (the old layout) are still loaded.
+    """
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self.segments_dir = os.path.join(index_path, "segments")
+        self.manifest_path = os.path.join(index_path, "manifest.json")
+        self.next_segment = 1
+        self._write_lock = threading.Lock()
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path, 'r') as f:
+            return json.load(f)
+
+    def _list_segments(self) -> List[int]:
+        if not os.path.isdir(self.segments_dir):
+            return []
+        numbers = []
+        for name in os.listdir(self.segments_dir):
+            match = _SEGMENT_PATTERN.match(name)
+            if match:
+                numbers.append(int(match.group(1)))
+        return sorted(numbers)
+
+    def _segment_path(self, number: int, ext: str) -> str:
+        return os.path.join(self.segments_dir, f"seg_{number:06d}{ext}")
+
+    def has_base(self) -> bool:
+        return self._read_manifest() is not None
+
+    def num_segments(self) -> int:
+        manifest = self._read_manifest()
+        merged = manifest["segment"] if manifest else 0
+        return len([n for n in self._list_segments() if n > merged])
+
+    def base_path(self) -> Optional[str]:
+        """Directory of the current base, if there is one"""
+        manifest = self._read_manifest()
+        return os.path.join(self.index_path, manifest["base"]) if manifest else None
+
+    def exists(self) -> bool:
+        return self.has_base() or os.path.exists(os.path.join(self.index_path, "index.faiss"))
+
+    def load(self, embeddings: Embeddings) -> Optional[FAISS]:
+        """Load the current base and replay the segments written after it"""
+        manifest = self._read_manifest()
+        segments = self._list_segments()
+        merged = 0
+
+        vector_store = None
+        if manifest is not None:
+            base_path = os.path.join(self.index_path, manifest["base"])
+            if MmapDocstore.exists(base_path):
+                # Only the FAISS index is read; chunks stay on disk until a search returns them
+                docstore = MmapDocstore(base_path)
+                vector_store = FAISS(
+                    embeddings,
+                    faiss.read_index(os.path.join(base_path, "index.faiss")),
+                    docstore,
+                    docstore.position_ids()
+                )
+            else:
+                vector_store = FAISS.load_local(base_path, embeddings, allow_dangerous_deserialization=True)
+            merged = manifest["segment"]
+        elif os.path.exists(os.path.join(self.index_path, "index.faiss")):
+            # Layout written before segments existed
+            vector_store = FAISS.load_local(
+                self.index_path,
+                embeddings,
+                allow_dangerous_deserialization=True
+            )
+
+        replayed = 0
+        for number in segments:
+            if number <= merged:
+                continue
+            vector_store = self._replay_segment(number, vector_store, embeddings)
+            replayed += 1
+        if replayed:
+            logger.info(f"Replayed {replayed} segments on top of the base index")
+
+        self.next_segment = max(segments + [merged]) + 1
+        return vector_store
+
+    def _replay_segment(self, number: int, vector_store: Optional[FAISS], embeddings: Embeddings) -> Optional[FAISS]:
+        vectors = np.load(self._segment_path(number, ".npy"))
+        with open(self._segment_path(number, ".jsonl"), 'r', encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+
+        deleted = [record["id"] for record in records if record.get("op") == "delete"]
+        if deleted and vector_store is not None:
+            ann_index.remove_documents(vector_store, deleted)
+
+        added = [record for record in records if record.get("op", "add") == "add"]
+        if added:
+            text_embeddings = list(zip([record["page_content"] for record in added], vectors.tolist()))
+            metadatas = [record["metadata"] for record in added]
+            ids = [record["id"] for record in added]
+            if vector_store is None:
+                vector_store = FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas, ids=ids)
+            else:
+                vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        return vector_store
+
+    def append_segment(
+        self,
+        ids: List[str],
+        documents: List[Document],
+        vectors: np.ndarray,
+        deleted_ids: Sequence[str] = ()
+    ) -> int:
+        """Write newly added vectors and their docstore entries as the next segment.
+
+        `deleted_ids` are removed from the store before the additions on replay.
+        """
+        os.makedirs(self.segments_dir, exist_ok=True)
+        number = self.next_segment
+        self.next_segment += 1
+
+        npy_tmp, jsonl_tmp = self._segment_path(number, ".npy.tmp"), self._segment_path(number, ".jsonl.tmp")
+        with open(npy_tmp, 'wb') as f:
+            np.save(f, np.asarray(vectors, dtype=np.float32))
+        with open(jsonl_tmp, 'w', encoding="utf-8") as f:
+            for id_ in deleted_ids:
+                f.write(json.dumps({"op": "delete", "id": id_}) + "\n")
+            for id_, doc in zip(ids, documents):
+                record = {"op": "add", "id": id_, "page_content": doc.page_content, "metadata": doc.metadata}
+                f.write(json.dumps(record) + "\n")
+
+        # The .jsonl file marks the segment as complete, so it is moved last
+        os.replace(npy_tmp, self._segment_path(number, ".npy"))
+        os.replace(jsonl_tmp, self._segment_path(number, ".jsonl"))
+        logger.info(f"Wrote segment {number} with {len(ids)} vectors and {len(deleted_ids)} deletions")
+        return number
+
+    def snapshot_segment(self) -> int:
+        """Number of the last segment written so far (what a base taken now includes)"""
+        return self.next_segment - 1
+
+    def write_base(self, vector_store: FAISS, last_segment: int, exact_vectors: Optional[ExactVectors] = None) -> str:
+        """Write a full snapshot that includes every segment up to `last_segment`, returns its path"""
+        with self._write_lock:
+            manifest = self._read_manifest()
+            version = manifest["version"] + 1 if manifest else 1
+            base = f"base_{version:06d}"
+
+            base_path = os.path.join(self.index_path, base)
+            os.makedirs(base_path, exist_ok=True)
+            faiss.write_index(vector_store.index, os.path.join(base_path, "index.faiss"))
+            MmapDocstore.write(base_path, vector_store.index_to_docstore_id, vector_store.docstore)
+            if exact_vectors is not None:
+                ids = vector_store.index_to_docstore_id.values()
+                exact_vectors.write(base_path, [id_ for id_ in ids if id_ != ann_index.DELETED_ID])
+
+            tmp_path = self.manifest_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({"base": base, "version": version, "segment": last_segment}, f)
+            os.replace(tmp_path, self.manifest_path)
+
+            self._cleanup(base, last_segment)
+            logger.info(f"Wrote base index {base} ({vector_store.index.ntotal} vectors)")
+            return base_path
+
+    def _cleanup(self, current_base: str, last_segment: int):
+        """Remove older bases, merged segments and files of the old layout"""
+        for name in os.listdir(self.index_path):
+            path = os.path.join(self.index_path, name)
+            if name.startswith("base_") and name != current_base:
+                shutil.rmtree(path, ignore_errors=True)
+            elif name in ("index.faiss", "index.pkl"):
+                os.remove(path)
+        for number in self._list_segments():
+            if number <= last_segment:
+                for ext in (".npy", ".jsonl"):
+                    path = self._segment_path(number, ext)
+                    if os.path.exists(path):
+                        os.remove(path)
@@ -0,0 +1,51 @@
+import os
+import logging
+from itertools import islice
+
+logger = logging.getLogger(__name__)
+
+# Chunks kept in memory for the Summary (first 20) and MCQ (first 15) agents
+MAX_PREVIEW_DOCUMENTS = 20
+
+
+def ingest_file(vector_manager, doc_loader, ingestion_cache, file_path, preview_documents):
+    """Add one file to the vector store, reusing cached chunks and embeddings when possible"""
+    key = ingestion_cache.key(file_path, doc_loader.settings_fingerprint())
+    # Chunks are tagged with the file name, not the upload path
+    source = os.path.basename(file_path)
+
+    if vector_manager.is_ingested(key):
+        # Same content with the same settings is already indexed
+        logger.info(f"Skipping already indexed file: {file_path}")
+        if ingestion_cache.has(key):
+            add_to_preview(list(islice(ingestion_cache.iter_documents(key), MAX_PREVIEW_DOCUMENTS)), preview_documents)
+        return 0
+
+    if ingestion_cache.has(key):
+        batches = ingestion_cache.iter_batches(key)
+    else:
+        # Load, chunk and embed in bounded batches, recording them for next time
+        chunks = doc_loader.iter_chunks(file_path)
+        batches = ingestion_cache.record(key, source, vector_manager.iter_embedded_batches(chunks))
+
+    if vector_manager.has_source(source):
+        # A new version of an indexed file: swap its chunks, leave the rest of the index alone
+        num_chunks = vector_manager.replace_source(source, with_preview(batches, preview_documents))
+    else:
+        num_chunks = vector_manager.add_embedded_batches(with_preview(batches, preview_documents))
+    vector_manager.mark_ingested(key, source)
+    return num_chunks
+
+
+def add_to_preview(documents, preview_documents):
+    """Keep the first few chunks in memory for the Summary and MCQ agents"""
+    room = MAX_PREVIEW_DOCUMENTS - len(preview_documents)
+    if room > 0:
+        preview_documents.extend(documents[:room])
+
+
+def with_preview(batches, preview_documents):
+    """Pass embedded batches through, filling the preview on the way"""
+    for batch, embeddings in batches:
+        add_to_preview(batch, preview_documents)
+        yield batch, embeddings
@@ -0,0 +1,116 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from langchain.schema import Document
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionCache:
+    """Content-addressed cache of chunked and embedded uploads.
+
+    Entries are keyed by the file hash plus the settings that shape the chunks
+    and embeddings, and stored under `processed_dir` as three files:
+    `<key>.jsonl` (chunks), `<key>.vec` (float32 embeddings) and `<key>.json`
+    (metadata, written last so a half-written entry is never used).
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or os.path.join(settings.processed_dir, "ingestion_cache")
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def file_hash(file_path: str) -> str:
+        """SHA-256 of the file contents, read in blocks"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def key(self, file_path: str, fingerprint: Dict[str, Any]) -> str:
+        """Cache key for a file processed with the given chunking/embedding settings"""
+        payload = json.dumps(
+            {"file": self.file_hash(file_path), "settings": fingerprint},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{ext}")
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(self._path(key, ".json"))
+
+    def _meta(self, key: str) -> Dict[str, Any]:
+        with open(self._path(key, ".json"), 'r') as f:
+            return json.load(f)
+
+    def iter_documents(self, key: str) -> Iterator[Document]:
+        """Yield the cached chunks of an entry, one line at a time"""
+        with open(self._path(key, ".jsonl"), 'r', encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                yield Document(page_content=record["page_content"], metadata=record["metadata"])
+
+    def iter_batches(
+        self,
+        key: str,
+        batch_size: Optional[int] = None
+    ) -> Iterator[Tuple[List[Document], List[List[float]]]]:
+        """Yield cached (documents, embeddings) batches, ready for VectorStoreManager"""
+        batch_size = batch_size or settings.ingest_batch_size
+        meta = self._meta(key)
+        if meta["num_chunks"] == 0:
+            return
+        vectors = np.memmap(self._path(key, ".vec"), dtype=np.float32, mode='r')
+        vectors = vectors.reshape(meta["num_chunks"], meta["dim"])
+
+        batch = []
+        for i, doc in enumerate(self.iter_documents(key)):
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                yield batch, vectors[i + 1 - len(batch):i + 1].tolist()
+                batch = []
+        if batch:
+            yield batch, vectors[meta["num_chunks"] - len(batch):].tolist()
+
+        logger.info(f"Reused {meta['num_chunks']} cached chunks for {meta['source']}")
+
+    def record(
+        self,
+        key: str,
+        source: str,
+        batches: Iterable[Tuple[List[Document], List[List[float]]]]
+    ) -> Iterator[Tuple[List[Document], List[List[float]]]]:
+        """Pass embedded batches through while writing them to the cache.
+
+        The entry only becomes visible once the whole stream has been consumed.
+        """
+        docs_tmp, vecs_tmp = self._path(key, ".jsonl.tmp"), self._path(key, ".vec.tmp")
+        num_chunks, dim = 0, 0
+
+        try:
+            with open(docs_tmp, 'w', encoding="utf-8") as docs_file, open(vecs_tmp, 'wb') as vecs_file:
+                for documents, embeddings in batches:
+                    for doc in documents:
+                        docs_file.write(json.dumps({"page_content": doc.page_content, "metadata": doc.metadata}) + "\n")
+                    array = np.asarray(embeddings, dtype=np.float32)
+                    vecs_file.write(array.tobytes())
+                    num_chunks += len(documents)
+                    dim = array.shape[1] if array.ndim == 2 else dim
+                    yield documents, embeddings
+
+            os.replace(docs_tmp, self._path(key, ".jsonl"))
+            os.replace(vecs_tmp, self._path(key, ".vec"))
+            with open(self._path(key, ".json"), 'w') as f:
+                json.dump({"source": source, "num_chunks": num_chunks, "dim": dim}, f)
+            logger.info(f"Cached {num_chunks} chunks for {source}")
+        finally:
+            for path in (docs_tmp, vecs_tmp):
+                if os.path.exists(path):
+                    os.remove(path)
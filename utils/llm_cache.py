@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Union
+from crewai import LLM
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Completion parameters that change the response, part of the cache key
+_KEY_PARAMS = (
+    "temperature", "top_p", "n", "stop", "max_tokens", "max_completion_tokens",
+    "presence_penalty", "frequency_penalty", "logit_bias", "seed", "response_format", "reasoning_effort",
+)
+
+
+class LLMResponseCache:
+    """Persistent SQLite cache of LLM responses.
+
+    Responses are keyed by the hash of the model, the rendered messages and the
+    sampling parameters. Entries older than `ttl_hours` are ignored and purged;
+    the least recently used ones are evicted when the cache grows past `max_mb`.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_mb: Optional[int] = None,
+        ttl_hours: Optional[float] = None
+    ):
+        self.db_path = db_path or os.path.join(settings.processed_dir, "llm_cache.sqlite")
+        self.max_bytes = (max_mb or settings.llm_cache_max_mb) * 1024 * 1024
+        self.ttl_seconds = (settings.llm_cache_ttl_hours if ttl_hours is None else ttl_hours) * 3600
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL, "
+            "last_access REAL NOT NULL, duration REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+        self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,))
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(LENGTH(response)), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def key(model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+        payload = json.dumps(
+            {"model": model, "messages": messages, "params": params},
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, duration FROM responses WHERE key = ? AND created >= ?",
+                (key, time.time() - self.ttl_seconds)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            self.saved_seconds += row[1]
+            return row[0]
+
+    def put(self, key: str, response: str, duration: float):
+        """Store a response with the time it took to generate"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", (key, response, now, now, duration))
+            self._size += len(response)
+            if self._size > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop expired entries, then least recently used ones down to 90% of the size cap"""
+        self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,))
+        total, count = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(response)), 0), COUNT(*) FROM responses"
+        ).fetchone()
+        if total > self.max_bytes and count:
+            excess = total - int(self.max_bytes * 0.9)
+            num_rows = min(count, -(-excess * count // total))
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                (num_rows,)
+            )
+            logger.info(f"Evicted {num_rows} LLM responses from cache")
+        self._size = self._conn.execute("SELECT COALESCE(SUM(LENGTH(response)), 0) FROM responses").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._size = 0
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "saved_seconds": self.saved_seconds,
+            "entries": entries,
+            "size_mb": self._size / (1024 * 1024),
+        }
+
+
+class CachedLLM(LLM):
+    """crewai LLM that answers repeated prompts from an LLMResponseCache.
+
+    Only plain text completions are cached; calls with native tools go to the
+    model every time. A streamed completion is stored once complete, and a
+    cached one is returned whole, without stream chunk events.
+    """
+
+    def __init__(self, *args, cache: Optional[LLMResponseCache] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = cache
+
+    def _cache_key(self, messages: Union[str, List[Dict[str, str]]]) -> str:
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        params = {name: getattr(self, name, None) for name in _KEY_PARAMS}
+        return LLMResponseCache.key(self.model, messages, params)
+
+    def call(
+        self,
+        messages: Union[str, List[Dict[str, str]]],
+        tools: Optional[List[dict]] = None,
+        callbacks: Optional[List[Any]] = None,
+        available_functions: Optional[Dict[str, Any]] = None,
+        from_task: Optional[Any] = None,
+        from_agent: Optional[Any] = None
+    ) -> Union[str, Any]:
+        if self.cache is None or tools or available_functions:
+            return super().call(messages, tools, callbacks, available_functions, from_task, from_agent)
+
+        key = self._cache_key(messages)
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.info(f"LLM response served from cache ({self.model})")
+            return cached
+
+        start = time.perf_counter()
+        response = super().call(messages, tools, callbacks, available_functions, from_task, from_agent)
+        if isinstance(response, str) and response:
+            self.cache.put(key, response, time.perf_counter() - start)
+        return response
@@ -1,7 +1,12 @@
+import threading
+from typing import Dict, Tuple
+import httpx
 from langchain_community.llms import Ollama
+from litellm.llms.custom_httpx.http_handler import HTTPHandler
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from config.settings import settings
-from crewai import LLM
+from utils.embedding_cache import CachedEmbeddings
+from utils.llm_cache import CachedLLM, LLMResponseCache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,6 +17,10 @@ class LLMManager:
     
     _llm_instance = None
     _embeddings_instance = None
+    _llm_cache_instance = None
+    _http_handler = None
+    _crew_llms: Dict[Tuple[float, bool], CachedLLM] = {}
+    _crew_llms_lock = threading.Lock()
     
     @classmethod
     def get_llm(cls):
@@ -23,6 +32,7 @@ class LLMManager:
                     model=settings.ollama_model,
                     temperature=0.7,
                     num_ctx=4096,
+                    timeout=settings.ollama_timeout,
                 )
                 logger.info(f"Initialized LLM: {settings.ollama_model}")
             except Exception as e:
@@ -30,22 +40,109 @@ class LLMManager:
                 raise
         return cls._llm_instance
     
+    @classmethod
+    def _embedding_model_kwargs(cls) -> dict:
+        """SentenceTransformer kwargs for the configured embedding backend"""
+        model_kwargs = {'device': 'cpu'}
+        backend = settings.embedding_backend
+
+        if backend in ("onnx", "onnx-int8"):
+            # ONNX Runtime through sentence-transformers (needs optimum[onnxruntime])
+            import onnxruntime
+
+            ort_kwargs = {"provider": "CPUExecutionProvider"}
+            if backend == "onnx-int8":
+                ort_kwargs["file_name"] = settings.embedding_onnx_int8_file
+            if settings.embedding_threads > 0:
+                session_options = onnxruntime.SessionOptions()
+                session_options.intra_op_num_threads = settings.embedding_threads
+                ort_kwargs["session_options"] = session_options
+
+            model_kwargs["backend"] = "onnx"
+            model_kwargs["model_kwargs"] = ort_kwargs
+        elif backend == "torch":
+            if settings.embedding_threads > 0:
+                import torch
+                torch.set_num_threads(settings.embedding_threads)
+        else:
+            raise ValueError(f"Unsupported embedding backend: {backend}")
+
+        return model_kwargs
+
     @classmethod
     def get_embeddings(cls):
         """Get or create embeddings instance"""
         if cls._embeddings_instance is None:
             try:
-                cls._embeddings_instance = HuggingFaceEmbeddings(
-                    model_name="sentence-transformers/all-MiniLM-L6-v2",
-                    model_kwargs={'device': 'cpu'},
-                    encode_kwargs={'normalize_embeddings': True}
+                embeddings = HuggingFaceEmbeddings(
+                    model_name=settings.embedding_model,
+                    model_kwargs=cls._embedding_model_kwargs(),
+                    encode_kwargs={
+                        'normalize_embeddings': True,
+                        'batch_size': settings.embedding_batch_size
+                    }
                 )
-                logger.info("Initialized embeddings model")
+                if settings.embedding_cache_enabled:
+                    # Quantized backends produce slightly different vectors, keep them apart
+                    model_name = f"{settings.embedding_model}:{settings.embedding_backend}"
+                    if settings.embedding_backend == "onnx-int8":
+                        model_name += f":{settings.embedding_onnx_int8_file}"
+                    embeddings = CachedEmbeddings(embeddings, model_name=model_name)
+                cls._embeddings_instance = embeddings
+                logger.info(f"Initialized embeddings model ({settings.embedding_backend} backend)")
             except Exception as e:
                 logger.error(f"Failed to initialize embeddings: {e}")
                 raise
         return cls._embeddings_instance
     
+    @classmethod
+    def get_llm_cache(cls):
+        """Get or create the LLM response cache shared by the crews (None when disabled)"""
+        if cls._llm_cache_instance is None and settings.llm_cache_enabled:
+            cls._llm_cache_instance = LLMResponseCache()
+            logger.info("Initialized LLM response cache")
+        return cls._llm_cache_instance
+
+    @classmethod
+    def _get_http_handler(cls) -> HTTPHandler:
+        """litellm HTTP handler with a keep-alive connection pool to Ollama (call with the crew LLM lock held)"""
+        if cls._http_handler is None:
+            cls._http_handler = HTTPHandler(client=httpx.Client(
+                timeout=httpx.Timeout(settings.ollama_timeout, connect=settings.ollama_connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=settings.ollama_max_connections,
+                    max_keepalive_connections=settings.ollama_max_connections
+                )
+            ))
+        return cls._http_handler
+
+    @classmethod
+    def get_crew_llm(cls, temperature: float, stream: bool = False) -> CachedLLM:
+        """Get or create the crew LLM for a temperature.
+
+        Crews with the same temperature share one client, and all of them share the
+        connection pool and the response cache. A streaming client emits crewai
+        `LLMStreamChunkEvent`s as tokens arrive.
+        """
+        with cls._crew_llms_lock:
+            llm = cls._crew_llms.get((temperature, stream))
+            if llm is None:
+                llm = CachedLLM(
+                    model=f"ollama/{settings.ollama_model}",
+                    base_url=settings.ollama_base_url,
+                    temperature=temperature,
+                    stream=stream,
+                    timeout=settings.ollama_timeout,
+                    cache=cls.get_llm_cache(),
+                    client=cls._get_http_handler()
+                )
+                cls._crew_llms[(temperature, stream)] = llm
+                logger.info(
+                    f"Initialized crew LLM: {settings.ollama_model} (temperature {temperature}"
+                    f"{', streaming' if stream else ''})"
+                )
+            return llm
+
     @classmethod
     def test_connection(cls):
         """Test LLM connection"""
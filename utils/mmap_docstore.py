@@ -0,0 +1,188 @@
+import os
+import json
+import mmap
+import logging
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Optional, Union
+import numpy as np
+from langchain.schema import Document
+from langchain_community.docstore.base import AddableMixin, Docstore
+
+logger = logging.getLogger(__name__)
+
+_RECORDS_FILE = "docstore.jsonl"
+_OFFSETS_FILE = "docstore_offsets.npy"
+_IDS_FILE = "docstore_ids.npy"
+_SORTED_IDS_FILE = "docstore_sorted_ids.npy"
+_SORTED_POSITIONS_FILE = "docstore_sorted_positions.npy"
+
+
+class PositionIds(MutableMapping):
+    """index position -> docstore id, read from a memory-mapped array.
+
+    Stands in for the `index_to_docstore_id` dict of langchain's FAISS store;
+    positions added after loading are kept in a regular dict.
+    """
+
+    def __init__(self, ids: np.ndarray, added: Optional[Dict[int, str]] = None):
+        self._ids = ids
+        self._added = dict(added or {})
+
+    def __getitem__(self, position: int) -> str:
+        if position in self._added:
+            return self._added[position]
+        if 0 <= position < len(self._ids):
+            return self._ids[position].decode("utf-8")
+        raise KeyError(position)
+
+    def __setitem__(self, position: int, id_: str):
+        self._added[position] = id_
+
+    def __delitem__(self, position: int):
+        del self._added[position]
+
+    def __iter__(self) -> Iterator[int]:
+        yield from range(len(self._ids))
+        yield from sorted(position for position in self._added if position >= len(self._ids))
+
+    def __len__(self) -> int:
+        return len(self._ids) + sum(1 for position in self._added if position >= len(self._ids))
+
+    def copy(self) -> "PositionIds":
+        return PositionIds(self._ids, self._added)
+
+    def positions_of(self, id_: str) -> List[int]:
+        """Positions mapped to `id_`, without decoding the other ids"""
+        saved = np.flatnonzero(self._ids == id_.encode("utf-8")).tolist()
+        positions = {position for position in saved if position not in self._added}
+        positions.update(position for position, added in self._added.items() if added == id_)
+        return sorted(positions)
+
+
+class MmapDocstore(Docstore, AddableMixin):
+    """Docstore whose saved chunks stay on disk in memory-mapped files.
+
+    Files written next to the FAISS index, all in index position order:
+        docstore.jsonl              one {"page_content", "metadata"} JSON record per chunk
+        docstore_offsets.npy        byte offset of each record (plus the end offset)
+        docstore_ids.npy            docstore id of each position
+        docstore_sorted_*.npy       ids sorted, with their positions, for lookups by id
+
+    Opening the store only maps the files; a chunk is decoded when a search
+    returns it. Chunks added or deleted afterwards are tracked in memory until
+    the next full write. Positions whose chunk was deleted (an empty id) are
+    written with an empty id and record.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._offsets = np.load(os.path.join(path, _OFFSETS_FILE), mmap_mode='r')
+        self._ids = np.load(os.path.join(path, _IDS_FILE), mmap_mode='r')
+        self._sorted_ids = np.load(os.path.join(path, _SORTED_IDS_FILE), mmap_mode='r')
+        self._sorted_positions = np.load(os.path.join(path, _SORTED_POSITIONS_FILE), mmap_mode='r')
+
+        self._file = open(os.path.join(path, _RECORDS_FILE), 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._records = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+        self._added: Dict[str, Document] = {}
+        self._deleted = set()
+        self._num_empty = int(np.count_nonzero(self._ids == b""))
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, _SORTED_POSITIONS_FILE))
+
+    @staticmethod
+    def write(path: str, index_to_docstore_id: MutableMapping, docstore: Docstore):
+        """Write the documents of any docstore in index position order"""
+        os.makedirs(path, exist_ok=True)
+        ids = [index_to_docstore_id[position] for position in range(len(index_to_docstore_id))]
+
+        offsets = np.empty(len(ids) + 1, dtype=np.int64)
+        offsets[0] = 0
+        with open(os.path.join(path, _RECORDS_FILE), 'wb') as f:
+            for position, id_ in enumerate(ids):
+                if id_:
+                    doc = docstore.search(id_)
+                    record = {"page_content": doc.page_content, "metadata": doc.metadata}
+                    f.write(json.dumps(record).encode("utf-8") + b"\n")
+                else:
+                    f.write(b"{}\n")
+                offsets[position + 1] = f.tell()
+
+        encoded = np.array([id_.encode("utf-8") for id_ in ids], dtype=bytes if ids else "S1")
+        order = np.argsort(encoded, kind="stable")
+        np.save(os.path.join(path, _OFFSETS_FILE), offsets)
+        np.save(os.path.join(path, _IDS_FILE), encoded)
+        np.save(os.path.join(path, _SORTED_IDS_FILE), encoded[order])
+        # Written last: its presence marks a complete docstore
+        np.save(os.path.join(path, _SORTED_POSITIONS_FILE), order.astype(np.int64))
+
+    def position_ids(self) -> PositionIds:
+        """index_to_docstore_id mapping of the saved chunks"""
+        return PositionIds(self._ids)
+
+    def _position(self, id_: str) -> Optional[int]:
+        key = id_.encode("utf-8")
+        i = int(np.searchsorted(self._sorted_ids, key))
+        if i < len(self._sorted_ids) and self._sorted_ids[i] == key:
+            return int(self._sorted_positions[i])
+        return None
+
+    def _decode(self, position: int, id_: str) -> Document:
+        record = json.loads(self._records[self._offsets[position]:self._offsets[position + 1]])
+        return Document(id=id_, page_content=record["page_content"], metadata=record["metadata"])
+
+    def search(self, search: str) -> Union[str, Document]:
+        if search in self._added:
+            return self._added[search]
+        if search not in self._deleted:
+            position = self._position(search)
+            if position is not None:
+                return self._decode(position, search)
+        return f"ID {search} not found."
+
+    def add(self, texts: Dict[str, Document]):
+        overlapping = [
+            id_ for id_ in texts
+            if id_ in self._added or (id_ not in self._deleted and self._position(id_) is not None)
+        ]
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        self._added.update(texts)
+
+    def delete(self, ids: List):
+        for id_ in ids:
+            if self._added.pop(id_, None) is None:
+                self._deleted.add(id_)
+
+    def copy(self) -> "MmapDocstore":
+        """Snapshot sharing the mapped files; later changes to either do not affect the other"""
+        snapshot = MmapDocstore.__new__(MmapDocstore)
+        snapshot.__dict__.update(self.__dict__)
+        snapshot._added = dict(self._added)
+        snapshot._deleted = set(self._deleted)
+        return snapshot
+
+    def rebased(self, path: str, snapshot: "MmapDocstore") -> Optional["MmapDocstore"]:
+        """The same documents read from a docstore written at `path` from `snapshot`.
+
+        `snapshot` is a copy() of this store taken earlier; changes made since then
+        are carried over. Returns None if the snapshot was not taken from this store.
+        """
+        if snapshot._records is not self._records:
+            return None
+        rebased = MmapDocstore(path)
+        rebased._added = {id_: doc for id_, doc in self._added.items() if id_ not in snapshot._added}
+        rebased._deleted = (self._deleted - snapshot._deleted) | (snapshot._added.keys() - self._added.keys())
+        return rebased
+
+    def close(self):
+        """Unmap the records file, after which neither this store nor its copies can be read"""
+        if isinstance(self._records, mmap.mmap):
+            self._records.close()
+        self._file.close()
+
+    def __len__(self) -> int:
+        return len(self._ids) - self._num_empty - len(self._deleted) + len(self._added)
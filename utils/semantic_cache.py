@@ -0,0 +1,112 @@
+import re
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Set
+import faiss
+import numpy as np
+from langchain.embeddings.base import Embeddings
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+
+
+def _numbers(question: str) -> Set[str]:
+    """Numbers of a question, with years shortened so "FY23" and "2023" compare equal"""
+    numbers = set()
+    for number in _NUMBER_PATTERN.findall(question):
+        if len(number) == 4 and number[:2] in ("19", "20"):
+            number = number[2:]
+        numbers.add(number.lstrip("0") or "0")
+    return numbers
+
+
+class SemanticAnswerCache:
+    """Answers of previous questions, looked up by question similarity.
+
+    Questions are embedded and kept in a FAISS inner-product index over unit
+    vectors (cosine similarity). A question reuses a previous answer when the
+    two are at least `threshold` similar, mention the same numbers (so "FY22
+    revenue" never gets the FY23 answer) and the vector store has not changed
+    since: entries belong to the `index_version` they were answered on and are
+    dropped as soon as another version is seen.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        threshold: Optional[float] = None,
+        max_entries: Optional[int] = None
+    ):
+        self.embeddings = embeddings
+        self.threshold = settings.semantic_cache_threshold if threshold is None else threshold
+        self.max_entries = max_entries or settings.semantic_cache_max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._index: Optional[faiss.IndexFlatIP] = None
+        self._entries: List[Dict[str, Any]] = []
+        self._version: Optional[int] = None
+
+    def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray([self.embeddings.embed_query(question)], dtype=np.float32)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _reset(self, version: int):
+        """Drop entries answered on another version of the vector store (call with the lock held)"""
+        if self._version != version:
+            if self._entries:
+                logger.info(f"Vector store changed, dropped {len(self._entries)} cached answers")
+            self._index = None
+            self._entries = []
+            self._version = version
+
+    def lookup(self, question: str, version: int) -> Optional[Dict[str, Any]]:
+        """Cached result of a similar question answered on this index version, or None"""
+        vector = self._embed(question)
+        with self._lock:
+            self._reset(version)
+            if self._index is not None and self._index.ntotal:
+                scores, positions = self._index.search(vector, 1)
+                score, position = float(scores[0][0]), int(positions[0][0])
+                if position >= 0 and score >= self.threshold:
+                    entry = self._entries[position]
+                    if _numbers(entry["question"]) == _numbers(question):
+                        self.hits += 1
+                        logger.info(f"Answer served from semantic cache (similarity {score:.3f})")
+                        return dict(entry["result"])
+            self.misses += 1
+            return None
+
+    def store(self, question: str, version: int, result: Dict[str, Any]):
+        vector = self._embed(question)
+        with self._lock:
+            if self._version is not None and version < self._version:
+                # Answered on a version that has been replaced meanwhile
+                return
+            self._reset(version)
+            if self._index is None:
+                self._index = faiss.IndexFlatIP(vector.shape[1])
+            if len(self._entries) >= self.max_entries:
+                # Oldest first
+                self._index.remove_ids(np.array([0], dtype=np.int64))
+                self._entries.pop(0)
+            self._index.add(vector)
+            self._entries.append({"question": question, "result": dict(result)})
+
+    def clear(self):
+        with self._lock:
+            self._index = None
+            self._entries = []
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+        }
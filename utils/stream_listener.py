@@ -0,0 +1,67 @@
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator
+from crewai.events import BaseEventListener, LLMStreamChunkEvent
+
+# Marker after which a ReAct agent's output is its answer
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+
+class StreamChunkListener(BaseEventListener):
+    """Relays the tokens of streaming crew LLMs to the agents' subscribers.
+
+    crewai emits an `LLMStreamChunkEvent` for every chunk of a streaming LLM,
+    on the thread running the crew. A subscriber gets the chunks of one agent
+    in a queue it can read from another thread.
+    """
+
+    def __init__(self):
+        self._queues: Dict[str, queue.Queue] = {}
+        self._lock = threading.Lock()
+        super().__init__()
+
+    def setup_listeners(self, crewai_event_bus):
+        @crewai_event_bus.on(LLMStreamChunkEvent)
+        def on_stream_chunk(source, event):
+            if event.tool_call is not None:
+                return
+            with self._lock:
+                chunks = self._queues.get(str(event.agent_id))
+            if chunks is not None:
+                chunks.put(event.chunk)
+
+    @contextmanager
+    def subscribe(self, agent_id: Any) -> Iterator[queue.Queue]:
+        """Queue receiving the stream chunks of an agent until the block exits"""
+        chunks: queue.Queue = queue.Queue()
+        with self._lock:
+            self._queues[str(agent_id)] = chunks
+        try:
+            yield chunks
+        finally:
+            with self._lock:
+                self._queues.pop(str(agent_id), None)
+
+
+def final_answer_tokens(chunks: Iterable[str]) -> Iterator[str]:
+    """Pass through the part of an agent's streamed output after "Final Answer:"."""
+    buffer, answering, started = "", False, False
+    for chunk in chunks:
+        if not answering:
+            buffer += chunk
+            position = buffer.find(FINAL_ANSWER_MARKER)
+            if position == -1:
+                continue
+            answering = True
+            chunk = buffer[position + len(FINAL_ANSWER_MARKER):]
+        if not started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                continue
+            started = True
+        yield chunk
+
+
+# Shared by all crews of the process
+stream_chunk_listener = StreamChunkListener()
@@ -1,13 +1,57 @@
 import os
+import re
+import json
+import uuid
 import logging
-from typing import List, Optional
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import faiss
+import numpy as np
 from langchain.schema import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
 from langchain.embeddings.base import Embeddings
 from config.settings import settings
+from utils.index_storage import IndexStorage
+from utils.lru_cache import LRUCache
+from utils.bm25_index import BM25Index
+from utils.exact_vectors import ExactVectors
+from utils.mmap_docstore import MmapDocstore, PositionIds
+from utils import ann_index
 
 logger = logging.getLogger(__name__)
 
+# Candidates taken from each retriever per hybrid result, before fusing
+_HYBRID_FETCH_FACTOR = 4
+
+# Metadata fields that searches can be filtered on
+FILTER_FIELDS = ("source", "page", "type")
+
+# Chunks decoded at a time while the side indexes are rebuilt after a load
+_SIDE_INDEX_BATCH = 10000
+
+
+def _normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip()
+
+
+def _filter_key(filter: Optional[Dict[str, Any]]) -> Optional[str]:
+    return json.dumps(filter, sort_keys=True, default=str) if filter else None
+
+
+def _min_max_normalize(scores: Dict[str, float]) -> Dict[str, float]:
+    if not scores:
+        return {}
+    low, high = min(scores.values()), max(scores.values())
+    if high == low:
+        return {key: 1.0 for key in scores}
+    return {key: (score - low) / (high - low) for key, score in scores.items()}
+
+
 class VectorStoreManager:
     """Manages FAISS vector store operations"""
 
@@ -15,14 +59,69 @@ class VectorStoreManager:
         self.embeddings = embeddings
         self.vector_store: Optional[FAISS] = None
         self.index_path = os.path.join(settings.vector_store_path, "faiss_index")
+        self.storage = IndexStorage(self.index_path)
+        # Ingestion cache keys of the files already in the index, with their source
+        self.ingested_keys: Dict[str, Optional[str]] = {}
+        # metadata["source"] -> docstore ids of its chunks
+        self.source_ids: Dict[str, List[str]] = {}
+        # Keyword index over the same chunks, for hybrid_search
+        self.bm25 = BM25Index()
+        # (field, value) -> index positions of the chunks with that metadata, for filtered searches
+        self._metadata_positions: Dict[Tuple[str, Any], List[int]] = {}
+        # docstore id -> index position, to read back the stored vector of a chunk
+        self._id_positions: Dict[str, int] = {}
+        # Index positions of deleted chunks: their vectors are skipped by searches until the index is rebuilt
+        self._deleted_positions = set()
+        # Uncompressed vectors by docstore id, to re-rank the candidates of a compressed index.
+        # Saved with each base and memory-mapped from it; only those added since are held in memory
+        self._exact_vectors = ExactVectors()
+        # The three indexes above are rebuilt in the background after a load; set once usable
+        self._side_indexes_ready = threading.Event()
+        self._side_indexes_ready.set()
+        self._side_index_thread: Optional[threading.Thread] = None
+
+        # Guards every change to the index; searches only read it
+        self._lock = threading.RLock()
+        # Vectors added since the last save, written out as the next segment
+        self._pending_ids: List[str] = []
+        self._pending_documents: List[Document] = []
+        self._pending_vectors: List[np.ndarray] = []
+        # Ids removed since the last save, written as delete records of the next segment
+        self._pending_deleted_ids: List[str] = []
+        self._needs_full_save = False
+        self._compaction_thread: Optional[threading.Thread] = None
+        self._rebuild_thread: Optional[threading.Thread] = None
+
+        # Recent search latencies (seconds) and query vectors, for stats()
+        self._search_latencies = deque(maxlen=1000)
+        self._recent_queries = deque(maxlen=50)
+
+        # Bumped on every change to the index; cached results of older versions are never returned
+        self.index_version = 0
+        self._query_embedding_cache = LRUCache(settings.query_cache_size)
+        self._result_cache = LRUCache(settings.query_cache_size)
+        # Compiled filters (sorted position arrays) of the current index version
+        self._filter_cache = LRUCache(64)
 
     def create_vector_store(self, documents: List[Document]) -> FAISS:
         """Create a new vector store from documents"""
         try:
-            self.vector_store = FAISS.from_documents(
-                documents=documents,
-                embedding=self.embeddings
-            )
+            self._side_indexes_ready.wait()
+            self.wait_for_compaction()
+            with self._lock:
+                self._close_store()
+                self.vector_store = None
+                self._bump_index_version()
+                self.source_ids = {}
+                self.bm25 = BM25Index()
+                self._metadata_positions = {}
+                self._id_positions = {}
+                self._deleted_positions = set()
+                self._exact_vectors.clear()
+                self._clear_pending()
+                # The new store replaces whatever is on disk
+                self._needs_full_save = True
+                self.add_embeddings(documents, self.embeddings.embed_documents([doc.page_content for doc in documents]))
             logger.info(f"Created vector store with {len(documents)} documents")
             return self.vector_store
         except Exception as e:
@@ -35,17 +134,541 @@ class VectorStoreManager:
             if self.vector_store is None:
                 self.create_vector_store(documents)
             else:
-                self.vector_store.add_documents(documents)
+                self.add_embeddings(documents, self.embeddings.embed_documents([doc.page_content for doc in documents]))
             logger.info(f"Added {len(documents)} documents to vector store")
         except Exception as e:
             logger.error(f"Failed to add documents: {e}")
             raise
 
+    def add_embeddings(self, documents: List[Document], embeddings: List[List[float]]):
+        """Add documents whose embeddings were already computed"""
+        try:
+            text_embeddings = list(zip([doc.page_content for doc in documents], embeddings))
+            metadatas = [doc.metadata for doc in documents]
+            ids = [str(uuid.uuid4()) for _ in documents]
+            self._side_indexes_ready.wait()
+            with self._lock:
+                start = self.vector_store.index.ntotal if self.vector_store is not None else 0
+                if self.vector_store is None:
+                    self.vector_store = FAISS.from_embeddings(
+                        text_embeddings=text_embeddings,
+                        embedding=self.embeddings,
+                        metadatas=metadatas,
+                        ids=ids
+                    )
+                else:
+                    self.vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+
+                self._pending_ids.extend(ids)
+                self._pending_documents.extend(documents)
+                self._pending_vectors.append(np.asarray(embeddings, dtype=np.float32))
+                if self._keeps_exact_vectors():
+                    self._exact_vectors.add(ids, self._pending_vectors[-1])
+                self._register_sources(ids, documents)
+                self.bm25.add(ids, [doc.page_content for doc in documents])
+                self._index_metadata(range(start, start + len(ids)), ids, documents)
+                self._bump_index_version()
+                self._start_index_rebuild()
+        except Exception as e:
+            logger.error(f"Failed to add embeddings: {e}")
+            raise
+
+    @staticmethod
+    def _keeps_exact_vectors() -> bool:
+        return settings.vector_index_rerank and settings.vector_index_compression != "none"
+
+    def _clear_pending(self):
+        self._pending_ids = []
+        self._pending_documents = []
+        self._pending_vectors = []
+        self._pending_deleted_ids = []
+
+    def _register_sources(self, ids: List[str], documents: List[Document]):
+        for id_, doc in zip(ids, documents):
+            source = doc.metadata.get("source")
+            if source is not None:
+                self.source_ids.setdefault(source, []).append(id_)
+
+    def _index_metadata(self, positions: Iterable[int], ids: List[str], documents: List[Document]):
+        """Record the index positions and filterable metadata of documents"""
+        for position, id_, doc in zip(positions, ids, documents):
+            self._id_positions[id_] = position
+            for field in FILTER_FIELDS:
+                value = doc.metadata.get(field)
+                if value is not None:
+                    self._metadata_positions.setdefault((field, value), []).append(position)
+
+    def _unindex_metadata(self, positions: List[int], documents: List[Document]):
+        """Forget the positions of deleted documents, touching only the metadata values they had"""
+        stale: Dict[Tuple[str, Any], set] = {}
+        for position, doc in zip(positions, documents):
+            for field in FILTER_FIELDS:
+                value = doc.metadata.get(field)
+                if value is not None:
+                    stale.setdefault((field, value), set()).add(position)
+        for key, removed in stale.items():
+            kept = [position for position in self._metadata_positions.get(key, ()) if position not in removed]
+            if kept:
+                self._metadata_positions[key] = kept
+            else:
+                self._metadata_positions.pop(key, None)
+
+    def _renumber(self, old_positions: np.ndarray):
+        """Move everything keyed by index position to an index holding only the vectors at
+        `old_positions` (sorted), in that order (call with the lock held)"""
+        new_positions = np.full(self.vector_store.index.ntotal, -1, dtype=np.int64)
+        new_positions[old_positions] = np.arange(len(old_positions))
+        mapping = self.vector_store.index_to_docstore_id
+        self.vector_store.index_to_docstore_id = {
+            new: mapping[int(old)] for new, old in enumerate(old_positions)
+        }
+        self._id_positions = {id_: int(new_positions[position]) for id_, position in self._id_positions.items()}
+        self._metadata_positions = {
+            key: new_positions[positions].tolist() for key, positions in self._metadata_positions.items()
+        }
+        # Chunks deleted while the new index was built are still in it
+        self._deleted_positions = {
+            int(new_positions[position]) for position in self._deleted_positions if new_positions[position] >= 0
+        }
+
+    def _filter_positions(self, filter: Dict[str, Any]) -> np.ndarray:
+        """Sorted index positions matching every field of a filter (call with the lock held).
+
+        A filter maps fields of FILTER_FIELDS to a value or a list of accepted values,
+        e.g. {"source": "10k.pdf", "page": [3, 4]} (sources are file names, without the
+        upload directory) or {"type": "csv_chunk"} (CSV rows; the summary chunk of a CSV
+        file has type "cvs", PDF pages "pdf").
+        """
+        key = _filter_key(filter)
+        cached = self._filter_cache.get(key)
+        if cached is not None:
+            return cached
+
+        selected = None
+        for field, value in filter.items():
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"Cannot filter on {field}, filterable fields: {', '.join(FILTER_FIELDS)}")
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            positions = set()
+            for accepted in values:
+                positions.update(self._metadata_positions.get((field, accepted), ()))
+            selected = positions if selected is None else selected & positions
+            if not selected:
+                break
+        positions = np.array(sorted(selected or ()), dtype=np.int64)
+        self._filter_cache.put(key, positions)
+        return positions
+
+    def _rebuild_side_indexes(self):
+        """Recreate the source registry, BM25 and metadata indexes from the docstore of a loaded store"""
+        self.source_ids = {}
+        self.bm25 = BM25Index()
+        self._metadata_positions = {}
+        self._id_positions = {}
+        if self.vector_store is None:
+            return
+
+        mapping = self.vector_store.index_to_docstore_id
+        docstore = self.vector_store.docstore
+        for start in range(0, len(mapping), _SIDE_INDEX_BATCH):
+            positions = [
+                pos for pos in range(start, min(start + _SIDE_INDEX_BATCH, len(mapping)))
+                if pos not in self._deleted_positions
+            ]
+            ids = [mapping[pos] for pos in positions]
+            documents = [docstore.search(id_) for id_ in ids]
+            for id_, doc in zip(ids, documents):
+                # Stores saved by older versions do not keep the id on the document
+                doc.id = doc.id or id_
+            self._register_sources(ids, documents)
+            self.bm25.add(ids, [doc.page_content for doc in documents])
+            self._index_metadata(positions, ids, documents)
+        logger.info(f"Rebuilt source, BM25 and metadata indexes over {len(mapping)} chunks")
+
+    def _start_side_index_build(self):
+        """Rebuild the side indexes in a background thread, so a loaded store can be searched at once.
+
+        Vector searches do not need them and hybrid searches rank by the vectors alone
+        until they are ready; filtered searches, additions and deletions wait for them.
+        """
+        self._side_indexes_ready.clear()
+
+        def build():
+            try:
+                self._rebuild_side_indexes()
+            except Exception as e:
+                logger.error(f"Failed to rebuild side indexes: {e}")
+            finally:
+                self._side_indexes_ready.set()
+
+        self._side_index_thread = threading.Thread(target=build, name="side-index-build", daemon=True)
+        self._side_index_thread.start()
+
+    def has_source(self, source: str) -> bool:
+        self._side_indexes_ready.wait()
+        return source in self.source_ids
+
+    def sources(self) -> Dict[str, int]:
+        """Number of chunks indexed per source"""
+        self._side_indexes_ready.wait()
+        return {source: len(ids) for source, ids in self.source_ids.items()}
+
+    def delete_source(self, source: str) -> int:
+        """Remove every chunk of a source from the index, returns the number removed.
+
+        Nothing is re-embedded or rebuilt: the chunks' vectors are masked out of
+        searches until a background rebuild drops them, and the removal is saved
+        as delete records in the next segment.
+        """
+        try:
+            self._side_indexes_ready.wait()
+            with self._lock:
+                removed = self._remove_chunks(source, set(self.source_ids.get(source, [])))
+            logger.info(f"Deleted {removed} chunks of {source} from vector store")
+            return removed
+        except Exception as e:
+            logger.error(f"Failed to delete {source} from vector store: {e}")
+            raise
+
+    def _remove_chunks(self, source: str, ids: set) -> int:
+        """Remove some chunks of a source and forget its ingested files (call with the lock held)"""
+        self.ingested_keys = {
+            key: key_source for key, key_source in self.ingested_keys.items() if key_source != source
+        }
+        if not ids or self.vector_store is None:
+            return 0
+
+        remaining = [id_ for id_ in self.source_ids.get(source, []) if id_ not in ids]
+        if remaining:
+            self.source_ids[source] = remaining
+        else:
+            self.source_ids.pop(source, None)
+
+        docstore = self.vector_store.docstore
+        documents = {id_: docstore.search(id_) for id_ in ids if id_ in self._id_positions}
+        positions = [self._id_positions.pop(id_) for id_ in documents]
+        self.bm25.remove({id_: doc.page_content for id_, doc in documents.items()})
+        self._exact_vectors.remove(ids)
+        ann_index.remove_documents(self.vector_store, documents, positions)
+        self._unindex_metadata(positions, list(documents.values()))
+        self._deleted_positions.update(positions)
+        removed = len(positions)
+        self._bump_index_version()
+
+        # Chunks not saved yet are simply dropped from the next segment
+        unsaved = ids.intersection(self._pending_ids)
+        if unsaved:
+            keep = [i for i, id_ in enumerate(self._pending_ids) if id_ not in unsaved]
+            vectors = np.vstack(self._pending_vectors)
+            self._pending_ids = [self._pending_ids[i] for i in keep]
+            self._pending_documents = [self._pending_documents[i] for i in keep]
+            self._pending_vectors = [vectors[keep]] if keep else []
+        self._pending_deleted_ids.extend(ids - unsaved)
+        self._start_index_rebuild()
+        return removed
+
+    def replace_source(self, source: str, batches: Iterable[Tuple[List[Document], List[List[float]]]]) -> int:
+        """Swap the chunks of a source for new (documents, embeddings) batches, returns the number added.
+
+        The new batches are streamed into the index next to the old chunks, which
+        are removed once the last batch is in, so only their ids are held in memory
+        and searches never see the source missing. Until then a search can return
+        both versions of the source. The lock is only held to add each batch and to
+        remove the old chunks, so queries do not wait for the file to be parsed and embedded.
+        """
+        try:
+            self._side_indexes_ready.wait()
+            with self._lock:
+                old_ids = set(self.source_ids.get(source, []))
+            added = self.add_embedded_batches(batches)
+            with self._lock:
+                removed = self._remove_chunks(source, old_ids)
+            logger.info(f"Replaced {removed} chunks of {source} with {added}")
+            return added
+        except Exception as e:
+            logger.error(f"Failed to replace {source} in vector store: {e}")
+            raise
+
+    def _iter_batches(self, documents: Iterable[Document], batch_size: int) -> Iterator[List[Document]]:
+        """Group a document stream into batches, parsing ahead in a bounded background queue.
+
+        The producer blocks once `ingest_queue_batches` batches are waiting, so parsing
+        never runs further ahead of embedding than that.
+        """
+        batches: queue.Queue = queue.Queue(maxsize=settings.ingest_queue_batches)
+        done = object()
+        stop = threading.Event()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                batch = []
+                for doc in documents:
+                    batch.append(doc)
+                    if len(batch) >= batch_size:
+                        if not put(batch):
+                            return
+                        batch = []
+                if batch:
+                    put(batch)
+                put(done)
+            except Exception as e:
+                put(e)
+
+        producer = threading.Thread(target=produce, name="ingest-producer", daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = batches.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            producer.join()
+
+    def iter_embedded_batches(
+        self,
+        documents: Iterable[Document],
+        batch_size: Optional[int] = None
+    ) -> Iterator[Tuple[List[Document], List[List[float]]]]:
+        """Yield (documents, embeddings) batches from a document stream"""
+        for batch in self._iter_batches(documents, batch_size or settings.ingest_batch_size):
+            embeddings = self.embeddings.embed_documents([doc.page_content for doc in batch])
+            yield batch, embeddings
+
+    def add_embedded_batches(self, batches: Iterable[Tuple[List[Document], List[List[float]]]]) -> int:
+        """Add pre-embedded (documents, embeddings) batches, returns the number of documents added"""
+        try:
+            total = 0
+            for batch, embeddings in batches:
+                self.add_embeddings(batch, embeddings)
+                total += len(batch)
+                # A large file is written out as it streams in instead of being held until the next save
+                if settings.vector_store_incremental and len(self._pending_ids) >= settings.vector_store_flush_vectors:
+                    self.save_vector_store()
+            logger.info(f"Streamed {total} documents into vector store")
+            return total
+        except Exception as e:
+            logger.error(f"Failed to add document stream: {e}")
+            raise
+
+    def add_documents_stream(self, documents: Iterable[Document], batch_size: Optional[int] = None) -> int:
+        """Embed and add a document stream in bounded batches, returns the number of documents added"""
+        return self.add_embedded_batches(self.iter_embedded_batches(documents, batch_size))
+
+    def is_ingested(self, key: str) -> bool:
+        """Whether the file with this ingestion cache key is already in the index"""
+        return key in self.ingested_keys
+
+    def mark_ingested(self, key: str, source: Optional[str] = None):
+        self.ingested_keys[key] = source
+
+    def _snapshot_store(self) -> FAISS:
+        """Copy of the current store that later additions do not touch (call with the lock held)"""
+        docstore = self.vector_store.docstore
+        if isinstance(docstore, MmapDocstore):
+            docstore = docstore.copy()
+        else:
+            docstore = InMemoryDocstore(dict(docstore._dict))
+        return FAISS(
+            self.embeddings,
+            faiss.clone_index(self.vector_store.index),
+            docstore,
+            self.vector_store.index_to_docstore_id.copy()
+        )
+
+    def _start_compaction(self) -> bool:
+        """Merge the segments into a new base index in a background thread (call with the lock held)"""
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return False
+
+        snapshot = self._snapshot_store()
+        last_segment = self.storage.snapshot_segment()
+        exact_snapshot = self._exact_vectors.copy() if self._keeps_exact_vectors() else None
+
+        def compact():
+            try:
+                base_path = self.storage.write_base(snapshot, last_segment, exact_snapshot)
+                # The side index build may still be reading the old base
+                self._side_indexes_ready.wait()
+                with self._lock:
+                    self._adopt_base(snapshot.docstore, base_path, exact_snapshot)
+                logger.info(f"Compacted segments up to {last_segment} into the base index")
+            except Exception as e:
+                logger.error(f"Failed to compact vector store: {e}")
+
+        self._compaction_thread = threading.Thread(target=compact, name="index-compaction", daemon=True)
+        self._compaction_thread.start()
+        return True
+
+    def _adopt_base(self, snapshot_docstore: Any, base_path: str, snapshot_exact: Optional[ExactVectors] = None):
+        """Read saved chunks from a base just written and unmap the previous one (call with the lock held).
+
+        Exact vectors written from `snapshot_exact` are read back from the base, and
+        the in-memory copies it saved are dropped. The docstore is only swapped when the
+        live one is memory-mapped and `snapshot_docstore` is a copy of it; the previous
+        base's files are deleted once written over.
+        """
+        if snapshot_exact is not None:
+            exact_vectors = self._exact_vectors.rebased(base_path, snapshot_exact)
+            if exact_vectors is not None:
+                self._exact_vectors = exact_vectors
+        docstore = self.vector_store.docstore if self.vector_store is not None else None
+        if not isinstance(docstore, MmapDocstore) or not isinstance(snapshot_docstore, MmapDocstore):
+            return
+        rebased = docstore.rebased(base_path, snapshot_docstore)
+        if rebased is None:
+            return
+
+        mapping = self.vector_store.index_to_docstore_id
+        if isinstance(mapping, PositionIds):
+            # Nothing was renumbered since the load, so saved positions are unchanged
+            position_ids = rebased.position_ids()
+            for position in range(len(position_ids), len(mapping)):
+                position_ids[position] = mapping[position]
+            for position in self._deleted_positions:
+                position_ids[position] = ann_index.DELETED_ID
+            self.vector_store.index_to_docstore_id = position_ids
+        self.vector_store.docstore = rebased
+        docstore.close()
+
+    def _close_store(self):
+        """Unmap the docstore of the current store before it is replaced (call with the lock held)"""
+        if self.vector_store is not None and isinstance(self.vector_store.docstore, MmapDocstore):
+            self.vector_store.docstore.close()
+
+    def wait_for_compaction(self):
+        if self._compaction_thread is not None:
+            self._compaction_thread.join()
+
+    def _write_pending_segment(self):
+        """Write the changes made since the last save as a new segment (call with the lock held)"""
+        if self._pending_ids or self._pending_deleted_ids:
+            if self._pending_vectors:
+                vectors = np.vstack(self._pending_vectors)
+            else:
+                vectors = np.empty((0, self.vector_store.index.d), dtype=np.float32)
+            self.storage.append_segment(
+                self._pending_ids,
+                self._pending_documents,
+                vectors,
+                self._pending_deleted_ids
+            )
+            self._clear_pending()
+
+    def _start_index_rebuild(self):
+        """Rebuild the index in a background thread when its type no longer fits the corpus size.
+
+        Small corpora use exact flat search; past `vector_index_ann_threshold` the index is
+        rebuilt as IVF or HNSW from its own vectors. Deleted vectors are left out, and
+        the index is also rebuilt once they make up `vector_index_max_deleted_fraction`
+        of it. Searches keep using the old index until the new one is swapped in, and
+        vectors added meanwhile are copied over at the swap. Call with the lock held.
+        """
+        if self.vector_store is None or (self._rebuild_thread is not None and self._rebuild_thread.is_alive()):
+            return
+        source = self.vector_store.index
+        kind = ann_index.rebuild_target(source, len(self._deleted_positions))
+        if kind is None:
+            return
+
+        num_vectors = source.ntotal
+        kept = np.setdiff1d(
+            np.arange(num_vectors, dtype=np.int64),
+            np.fromiter(self._deleted_positions, dtype=np.int64, count=len(self._deleted_positions))
+        )
+        vectors = source.reconstruct_n(0, num_vectors)[kept]
+        # The vectors of an uncompressed index are exact: keep them for re-ranking the new one
+        mapping = self.vector_store.index_to_docstore_id
+        exact_ids = (
+            [mapping[int(position)] for position in kept]
+            if self._keeps_exact_vectors() and ann_index.compression_type(source) == "none" else []
+        )
+
+        def rebuild():
+            try:
+                start = time.perf_counter()
+                index = ann_index.build_index(vectors, kind, source.metric_type)
+                if len(kept) < num_vectors:
+                    # Positions are renumbered at the swap, the side indexes must be complete
+                    self._side_indexes_ready.wait()
+                with self._lock:
+                    if self.vector_store is None or self.vector_store.index is not source:
+                        logger.warning("Vector store changed during the index rebuild, discarding it")
+                        return
+                    if source.ntotal > num_vectors:
+                        index.add(source.reconstruct_n(num_vectors, source.ntotal - num_vectors))
+                    if len(kept) < num_vectors:
+                        self._renumber(np.concatenate([kept, np.arange(num_vectors, source.ntotal, dtype=np.int64)]))
+                    self.vector_store.index = index
+                    missing = [row for row, id_ in enumerate(exact_ids) if id_ not in self._exact_vectors]
+                    if missing:
+                        self._exact_vectors.add([exact_ids[row] for row in missing], vectors[missing])
+                    self._bump_index_version()
+
+                    # Persist the new index type with the next base
+                    if settings.vector_store_incremental and self.storage.has_base() and not self._needs_full_save:
+                        self._write_pending_segment()
+                        if not self._start_compaction():
+                            self._needs_full_save = True
+                    else:
+                        self._needs_full_save = True
+                logger.info(
+                    f"Rebuilt vector index as {kind} with {index.ntotal} vectors "
+                    f"in {time.perf_counter() - start:.1f}s"
+                )
+            except Exception as e:
+                logger.error(f"Failed to rebuild vector index: {e}")
+
+        self._rebuild_thread = threading.Thread(target=rebuild, name="index-rebuild", daemon=True)
+        self._rebuild_thread.start()
+        logger.info(f"Rebuilding {ann_index.index_type(source)} index with {num_vectors} vectors as {kind}")
+
+    def wait_for_index_rebuild(self):
+        if self._rebuild_thread is not None:
+            self._rebuild_thread.join()
+
     def save_vector_store(self):
-        """Save vector store to disk"""
+        """Save vector store to disk.
+
+        In incremental mode only the vectors added since the last save are written,
+        as a new append-only segment; segments are merged into the base index in the
+        background once `vector_store_compact_segments` of them have piled up.
+        """
         try:
             if self.vector_store is not None:
-                self.vector_store.save_local(self.index_path)
+                with self._lock:
+                    if settings.vector_store_incremental and self.storage.has_base() and not self._needs_full_save:
+                        self._write_pending_segment()
+                        if self.storage.num_segments() >= settings.vector_store_compact_segments:
+                            self._start_compaction()
+                    else:
+                        docstore = self.vector_store.docstore
+                        snapshot_docstore = docstore.copy() if isinstance(docstore, MmapDocstore) else None
+                        exact_vectors = self._exact_vectors if self._keeps_exact_vectors() else None
+                        base_path = self.storage.write_base(
+                            self.vector_store, self.storage.snapshot_segment(), exact_vectors
+                        )
+                        self._clear_pending()
+                        self._needs_full_save = False
+                        # The side index build may still be reading the old docstore
+                        if not self._side_indexes_ready.is_set():
+                            snapshot_docstore = None
+                        self._adopt_base(snapshot_docstore, base_path, exact_vectors)
+
+                    with open(os.path.join(self.index_path, "ingested.json"), 'w') as f:
+                        json.dump(self.ingested_keys, f, sort_keys=True)
                 logger.info(f"Saved vector store to {self.index_path}")
         except Exception as e:
             logger.error(f"Failed to save vector store: {e}")
@@ -54,33 +677,444 @@ class VectorStoreManager:
     def load_vector_store(self) -> bool:
         """Load vector store from disk"""
         try:
-            if os.path.exists(self.index_path):
-                self.vector_store = FAISS.load_local(
-                    self.index_path,
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
-                )
+            if self.storage.exists():
+                self._side_indexes_ready.wait()
+                self.wait_for_index_rebuild()
+                self.wait_for_compaction()
+                vector_store = self.storage.load(self.embeddings)
+                with self._lock:
+                    self._close_store()
+                    self.vector_store = vector_store
+                    self._deleted_positions = (
+                        set(ann_index.deleted_positions(vector_store)) if vector_store is not None else set()
+                    )
+                    base_path = self.storage.base_path()
+                    self._exact_vectors = ExactVectors(
+                        base_path if self._keeps_exact_vectors() and vector_store is not None else None
+                    )
+                    self._bump_index_version()
+                    self._clear_pending()
+                    self._needs_full_save = False
+                    if self.vector_store is not None:
+                        ann_index.tune_index(self.vector_store.index)
+                        self._start_index_rebuild()
+                self._start_side_index_build()
+                ingested_path = os.path.join(self.index_path, "ingested.json")
+                if os.path.exists(ingested_path):
+                    with open(ingested_path, 'r') as f:
+                        ingested = json.load(f)
+                    # Older stores saved a plain list of keys
+                    self.ingested_keys = ingested if isinstance(ingested, dict) else dict.fromkeys(ingested)
                 logger.info(f"Loaded vector store from {self.index_path}")
-                return True
+                return self.vector_store is not None
             return False
         except Exception as e:
             logger.error(f"Failed to load vector store: {e}")
+            # Whatever is on disk cannot be read back: the next save replaces it instead of adding segments
+            self._needs_full_save = True
             return False
         
-    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
-        """Perform similarity search"""
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """Perform similarity search, optionally restricted to chunks matching a metadata filter"""
         try:
             if self.vector_store is None:
                 logger.warning("Vector store not initialized")
                 return []
             
-            results = self.vector_store.similarity_search(query, k=k)
+            results = [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
             logger.info(f"Found {len(results)} similar documents")
             return results
         except Exception as e:
             logger.error(f"Failed to perform similarity search: {e}")
             return []
-        
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """Similarity search returning (document, distance) pairs"""
+        return self.similarity_search_batch([query], k=k, filter=filter)[0]
+
+    def similarity_search_batch(
+        self,
+        queries: List[str],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """Search several queries at once, returns (document, distance) pairs per query.
+
+        The queries are embedded in one batched call (sentence-transformers embeds
+        queries and documents alike) and searched with a single matrix FAISS search.
+        Queries seen recently are answered from the in-memory caches. A metadata
+        `filter` (see `_filter_positions`) is applied inside the FAISS search.
+        """
+        try:
+            if self.vector_store is None:
+                logger.warning("Vector store not initialized")
+                return [[] for _ in queries]
+            if not queries:
+                return []
+
+            # Results are only valid for the index version they were computed on
+            version = self.index_version
+            filter_key = _filter_key(filter)
+            keys = [(version, _normalize_query(query), k, filter_key) for query in queries]
+            results = [self._result_cache.get(key) for key in keys]
+            missing = [i for i, result in enumerate(results) if result is None]
+
+            if missing:
+                vectors = self._embed_queries([keys[i][1] for i in missing])
+                for i, result in zip(missing, self._search_vectors(vectors, k, filter)):
+                    results[i] = result
+                    self._result_cache.put(keys[i], result)
+
+            logger.info(f"Found similar documents for {len(queries)} queries ({len(queries) - len(missing)} cached)")
+            return results
+        except Exception as e:
+            logger.error(f"Failed to perform batched similarity search: {e}")
+            return [[] for _ in queries]
+
+    def hybrid_search(
+        self,
+        query: str,
+        k: int = 4,
+        alpha: Optional[float] = None,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """Fuse BM25 and vector similarity, returns (document, fused score) pairs best first.
+
+        Both retrievers contribute `k * 4` candidates; their scores are min-max
+        normalized over those candidates and mixed as alpha * vector + (1 - alpha) * BM25,
+        so exact tokens (tickers, line items, fiscal years) can lift a chunk that
+        embeddings alone rank low.
+        """
+        try:
+            if self.vector_store is None:
+                logger.warning("Vector store not initialized")
+                return []
+
+            alpha = settings.hybrid_search_alpha if alpha is None else alpha
+            key = (self.index_version, "hybrid", _normalize_query(query), k, alpha, _filter_key(filter))
+            cached = self._result_cache.get(key)
+            if cached is not None:
+                return cached
+
+            fetch_k = k * _HYBRID_FETCH_FACTOR
+            vector_results = self.similarity_search_with_score(query, k=fetch_k, filter=filter)
+            # Right after a load BM25 is still being built: rank by the vectors alone rather than wait
+            keywords_ready = self._side_indexes_ready.is_set()
+            if not keywords_ready:
+                logger.info("Keyword index not ready yet, hybrid search uses vector scores only")
+                alpha = 1.0
+
+            documents = {doc.id: doc for doc, _ in vector_results}
+            keyword_results = []
+            if keywords_ready:
+                with self._lock:
+                    snapshot = self.bm25.snapshot(query)
+                    accept = None
+                    if filter:
+                        # Filter before taking the top fetch_k, so matching chunks are not crowded out
+                        selected = set(self._filter_positions(filter).tolist())
+                        # Renumbering replaces this dict, so it stays consistent with `selected`
+                        id_positions = self._id_positions
+                        accept = lambda id_: id_positions.get(id_) in selected
+                # Scored without the lock, so additions and deletions are not held up
+                keyword_results = snapshot.search(fetch_k, accept)
+                with self._lock:
+                    # Chunks deleted meanwhile are dropped
+                    keyword_results = [(id_, score) for id_, score in keyword_results if id_ in self._id_positions]
+                    for id_, _ in keyword_results:
+                        if id_ not in documents:
+                            documents[id_] = self.vector_store.docstore.search(id_)
+
+            # Larger is better for both after this
+            if self.vector_store.distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT:
+                vector_scores = {doc.id: score for doc, score in vector_results}
+            else:
+                vector_scores = {doc.id: -score for doc, score in vector_results}
+            vector_scores = _min_max_normalize(vector_scores)
+            keyword_scores = _min_max_normalize(dict(keyword_results))
+
+            fused = [
+                (doc, alpha * vector_scores.get(id_, 0.0) + (1 - alpha) * keyword_scores.get(id_, 0.0))
+                for id_, doc in documents.items()
+            ]
+            fused.sort(key=lambda item: item[1], reverse=True)
+            results = fused[:k]
+
+            if keywords_ready:
+                self._result_cache.put(key, results)
+            logger.info(f"Found {len(results)} documents with hybrid search")
+            return results
+        except Exception as e:
+            logger.error(f"Failed to perform hybrid search: {e}")
+            return []
+
+    def relevance_search(
+        self,
+        query: str,
+        max_k: Optional[int] = None,
+        fetch_k: Optional[int] = None,
+        min_relevance: Optional[float] = None,
+        margin: Optional[float] = None,
+        filter: Optional[Dict[str, Any]] = None,
+        hybrid: Optional[bool] = None
+    ) -> List[Tuple[Document, float]]:
+        """Adaptive-k search, returns (document, relevance) pairs best first.
+
+        `fetch_k` candidates are retrieved (with hybrid search if enabled) and scored
+        by their cosine similarity to the query. Candidates below `min_relevance` or
+        more than `margin` below the best one are dropped, so a question answered by
+        one chunk gets one chunk; the best candidate is always kept. At most `max_k`
+        are returned. Defaults come from the `retrieval_*` settings.
+        """
+        try:
+            if self.vector_store is None:
+                logger.warning("Vector store not initialized")
+                return []
+
+            max_k = settings.retrieval_max_k if max_k is None else max_k
+            fetch_k = max(max_k, settings.retrieval_fetch_k if fetch_k is None else fetch_k)
+            min_relevance = settings.retrieval_min_relevance if min_relevance is None else min_relevance
+            margin = settings.retrieval_relevance_margin if margin is None else margin
+            hybrid = settings.hybrid_search_enabled if hybrid is None else hybrid
+
+            # Until the keyword index is rebuilt after a load, hybrid search would rank by vectors alone anyway
+            if hybrid and self._side_indexes_ready.is_set():
+                documents = [doc for doc, _ in self.hybrid_search(query, k=fetch_k, filter=filter)]
+                scored = list(zip(documents, self._cosine_similarities(query, documents)))
+            else:
+                scored = [
+                    (doc, self._similarity(score))
+                    for doc, score in self.similarity_search_with_score(query, k=fetch_k, filter=filter)
+                ]
+            if not scored:
+                return []
+
+            best = max(score for _, score in scored)
+            cutoff = max(min_relevance, best - margin)
+            kept = [(doc, score) for doc, score in scored if score >= cutoff]
+            # Hybrid candidates come in fused order; keep it, it already accounts for exact terms
+            results = (kept or [max(scored, key=lambda item: item[1])])[:max_k]
+            logger.info(f"Kept {len(results)} of {len(scored)} candidates (best relevance {best:.3f})")
+            return results
+        except Exception as e:
+            logger.error(f"Failed to perform relevance search: {e}")
+            return []
+
+    def _similarity(self, score: float) -> float:
+        """Cosine similarity from a FAISS score (embeddings are normalized to unit length)"""
+        if self.vector_store.distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT:
+            return score
+        # Squared L2 distance between unit vectors: d^2 = 2 - 2 cos
+        return 1.0 - score / 2.0
+
+    def _cosine_similarities(self, query: str, documents: List[Document]) -> List[float]:
+        """Cosine similarity of each document to the query, from the vectors already stored.
+
+        Exact copies are used when kept for re-ranking, otherwise the vectors are read
+        back from the index (decoded, for a compressed one). Nothing is re-embedded
+        unless a chunk is missing from the index.
+        """
+        if not documents:
+            return []
+        query_vector = self._embed_queries([_normalize_query(query)])[0]
+        query_vector = query_vector / np.linalg.norm(query_vector)
+
+        vectors = np.zeros((len(documents), len(query_vector)), dtype=np.float32)
+        with self._lock:
+            exact_rows = [i for i, doc in enumerate(documents) if doc.id in self._exact_vectors]
+            if exact_rows:
+                vectors[exact_rows] = self._exact_vectors.get([documents[i].id for i in exact_rows])
+            stored_rows = [
+                i for i, doc in enumerate(documents)
+                if doc.id not in self._exact_vectors and doc.id in self._id_positions
+            ]
+            if stored_rows:
+                positions = np.array([self._id_positions[documents[i].id] for i in stored_rows], dtype=np.int64)
+                vectors[stored_rows] = self.vector_store.index.reconstruct_batch(positions)
+        missing_rows = sorted(set(range(len(documents))) - set(exact_rows) - set(stored_rows))
+        if missing_rows:
+            vectors[missing_rows] = self.embeddings.embed_documents([documents[i].page_content for i in missing_rows])
+
+        faiss.normalize_L2(vectors)
+        return [float(score) for score in vectors @ query_vector]
+
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed queries in one call, reusing the embeddings of recent queries"""
+        vectors = [self._query_embedding_cache.get(query) for query in queries]
+        missing = list(dict.fromkeys(query for query, vector in zip(queries, vectors) if vector is None))
+        if missing:
+            if len(missing) == 1:
+                computed = {missing[0]: self.embeddings.embed_query(missing[0])}
+            else:
+                computed = dict(zip(missing, self.embeddings.embed_documents(missing)))
+            for query, vector in computed.items():
+                self._query_embedding_cache.put(query, vector)
+            vectors = [computed[query] if vector is None else vector for query, vector in zip(queries, vectors)]
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.vector_store._normalize_L2:
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def _search_vectors(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """One matrix FAISS search, mapped back to (document, distance) pairs.
+
+        With a filter, small matching subsets are searched exactly on their own vectors;
+        larger ones are passed to FAISS as an ID bitmap so only matching vectors compete
+        for the top-k. Candidates of a compressed index are re-ranked by exact distance.
+        """
+        if filter:
+            self._side_indexes_ready.wait()
+        start = time.perf_counter()
+        requested_k = k
+        with self._lock:
+            index = self.vector_store.index
+            rerank = settings.vector_index_rerank and ann_index.compression_type(index) != "none"
+            if rerank:
+                k = requested_k * settings.vector_index_rerank_factor
+            # Positions and docstore ids must come from the same version of the index
+            if filter:
+                selected = self._filter_positions(filter)
+                if len(selected) == 0:
+                    return [[] for _ in vectors]
+                if len(selected) <= settings.filtered_search_exact_max:
+                    distances, positions = ann_index.search_subset(index, vectors, k, selected)
+                else:
+                    distances, positions = ann_index.search_selected(index, vectors, k, selected)
+            elif self._deleted_positions:
+                deleted = np.fromiter(self._deleted_positions, dtype=np.int64, count=len(self._deleted_positions))
+                distances, positions = ann_index.search_excluding(index, vectors, k, deleted)
+            else:
+                distances, positions = index.search(vectors, k)
+            index_to_docstore_id = self.vector_store.index_to_docstore_id
+            docstore = self.vector_store.docstore
+            results = []
+            for row_distances, row_positions in zip(distances, positions):
+                results.append([
+                    (docstore.search(index_to_docstore_id[pos]), float(distance))
+                    for distance, pos in zip(row_distances, row_positions)
+                    if pos != -1
+                ])
+        if rerank:
+            results = self._rerank(vectors, results, requested_k)
+        elapsed = time.perf_counter() - start
+
+        # Per-query latency, so stats() stays comparable between single and batched searches
+        self._search_latencies.extend([elapsed / len(vectors)] * len(vectors))
+        if not filter:
+            # Recall is estimated against unfiltered exact search
+            self._recent_queries.extend((vector, requested_k) for vector in vectors[-self._recent_queries.maxlen:])
+        return results
+
+    def _rerank(
+        self,
+        vectors: np.ndarray,
+        results: List[List[Tuple[Document, float]]],
+        k: int
+    ) -> List[List[Tuple[Document, float]]]:
+        """Order the candidates of a compressed index by their exact distance to each query.
+
+        Distances come from the uncompressed copies in `_exact_vectors`. Chunks without
+        one (replayed from segments, or saved while re-ranking was off) are embedded once
+        (from the persistent embedding cache) and kept.
+        """
+        documents = {doc.id: doc for row in results for doc, _ in row}
+        if not documents:
+            return results
+        missing = [id_ for id_ in documents if id_ not in self._exact_vectors]
+        if missing:
+            self._exact_vectors.add(
+                missing,
+                self.embeddings.embed_documents([documents[id_].page_content for id_ in missing])
+            )
+        ids = list(documents)
+        exact = self._exact_vectors.get(ids)
+        if self.vector_store._normalize_L2:
+            faiss.normalize_L2(exact)
+        rows = {id_: row for row, id_ in enumerate(ids)}
+
+        inner_product = self.vector_store.index.metric_type == faiss.METRIC_INNER_PRODUCT
+        reranked = []
+        for query, candidates in zip(vectors, results):
+            candidate_vectors = exact[[rows[doc.id] for doc, _ in candidates]]
+            if inner_product:
+                scores = candidate_vectors @ query
+                order = np.argsort(-scores)
+            else:
+                scores = ((candidate_vectors - query) ** 2).sum(axis=1)
+                order = np.argsort(scores)
+            reranked.append([(candidates[i][0], float(scores[i])) for i in order[:k]])
+        return reranked
+
+    def _bump_index_version(self):
+        """Invalidate cached search results after the index changed (call with the lock held)"""
+        self.index_version += 1
+        self._result_cache.clear()
+        self._filter_cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Index type and parameters, search latency and estimated recall.
+
+        Recall@k is measured on the most recent queries (or on stored vectors if
+        there were none yet) against an exact search over the same vectors.
+        """
+        latencies = np.array(self._search_latencies) * 1000
+        stats: Dict[str, Any] = {
+            "index_type": None,
+            "num_vectors": 0,
+            "deleted_vectors": len(self._deleted_positions),
+            "rebuilding": self._rebuild_thread is not None and self._rebuild_thread.is_alive(),
+            "searches": len(latencies),
+            "latency_ms_mean": float(latencies.mean()) if len(latencies) else None,
+            "latency_ms_p50": float(np.percentile(latencies, 50)) if len(latencies) else None,
+            "latency_ms_p95": float(np.percentile(latencies, 95)) if len(latencies) else None,
+            "recall": None,
+            "index_version": self.index_version,
+            "query_embedding_cache": self._query_embedding_cache.stats(),
+            "result_cache": self._result_cache.stats(),
+        }
+        if self.vector_store is None:
+            return stats
+
+        index = self.vector_store.index
+        stats.update(ann_index.describe(index))
+        # Exact copies kept for re-ranking count towards the cost of each vector
+        exact_bytes = self._exact_vectors.nbytes()
+        stats["index_bytes_per_vector"] = stats["bytes_per_vector"]
+        stats["exact_bytes_per_vector"] = exact_bytes / index.ntotal if index.ntotal else 0.0
+        stats["bytes_per_vector"] += stats["exact_bytes_per_vector"]
+        stats["exact_vectors_in_memory_mb"] = self._exact_vectors.memory_bytes() / 2**20
+        stats["keyword_index_mb"] = self.bm25.nbytes() / 2**20
+        if index.ntotal == 0:
+            return stats
+        if stats["index_type"] == "flat":
+            stats["recall"] = 1.0
+            return stats
+
+        queries = list(self._recent_queries)
+        if not queries:
+            rows = np.random.default_rng(0).choice(index.ntotal, min(50, index.ntotal), replace=False)
+            queries = [(index.reconstruct(int(row)), 4) for row in rows]
+        found, expected = 0, 0
+        for vector, k in queries:
+            query = np.asarray([vector], dtype=np.float32)
+            approx = set(index.search(query, k)[1][0].tolist()) - {-1}
+            exact = set(ann_index.exact_search(index, query, k)[0].tolist()) - {-1}
+            found += len(approx & exact)
+            expected += len(exact)
+        stats["recall"] = found / expected if expected else None
+        return stats
+
     def get_retriever(self, k: int = 4):
         """Get retriever for RAG"""
         if self.vector_store is None:
@@ -92,8 +1126,24 @@ class VectorStoreManager:
     
     def clear_vector_store(self):
         """Clean the vector store"""
-        self.vector_store = None
-        if os.path.exists(self.index_path):
-            import shutil
-            shutil.rmtree(self.index_path)
+        self._side_indexes_ready.wait()
+        self.wait_for_index_rebuild()
+        self.wait_for_compaction()
+        with self._lock:
+            self._close_store()
+            self.vector_store = None
+            self._bump_index_version()
+            self.ingested_keys = {}
+            self.source_ids = {}
+            self.bm25 = BM25Index()
+            self._metadata_positions = {}
+            self._id_positions = {}
+            self._deleted_positions = set()
+            self._exact_vectors.clear()
+            self._clear_pending()
+            self._needs_full_save = False
+            if os.path.exists(self.index_path):
+                import shutil
+                shutil.rmtree(self.index_path)
+            self.storage = IndexStorage(self.index_path)
         logger.info("Cleared vector store")
\ No newline at end of file
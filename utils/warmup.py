@@ -0,0 +1,125 @@
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from langchain.embeddings.base import Embeddings
+from utils.llm_manager import LLMManager
+from utils.vector_store_manager import VectorStoreManager
+
+logger = logging.getLogger(__name__)
+
+COMPONENTS = ("llm", "embeddings", "vector_store")
+
+
+class _PendingEmbeddings(Embeddings):
+    """Embeddings that wait for the warm-up to finish loading the model.
+
+    Lets the vector store be loaded while the embedding model is still loading.
+    """
+
+    def __init__(self, warmup: "Warmup"):
+        self._warmup = warmup
+
+    def _embeddings(self) -> Embeddings:
+        if not self._warmup.wait("embeddings"):
+            raise RuntimeError(f"Embedding model failed to load: {self._warmup.errors.get('embeddings')}")
+        return LLMManager.get_embeddings()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embeddings().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embeddings().embed_query(text)
+
+
+class Warmup:
+    """Runs the slow startup steps in parallel background threads.
+
+    - llm: test generation against Ollama (also loads the model weights there)
+    - embeddings: loads the sentence-transformers model
+    - vector_store: loads the saved index (its docstore is memory-mapped)
+
+    Each component reports "pending", "running", "ready" or "failed"; queries can
+    start once `embeddings` and `vector_store` are ready. A saved vector store that
+    cannot be loaded does not fail the warm-up: the index starts empty, the error
+    is kept in `errors` and clearing the store removes the unreadable files.
+
+    `vector_manager` is shared by every session of the process. Its own lock keeps
+    each search consistent with concurrent changes, so queries never wait for an
+    upload (they see its chunks as they are added); uploads hold `ingest_lock` so
+    two sessions never index or save files at the same time.
+    """
+
+    def __init__(self):
+        self.status: Dict[str, str] = {name: "pending" for name in COMPONENTS}
+        self.errors: Dict[str, str] = {}
+        self.durations: Dict[str, float] = {}
+        self.vector_manager = VectorStoreManager(_PendingEmbeddings(self))
+        self.ingest_lock = threading.Lock()
+        self._events = {name: threading.Event() for name in COMPONENTS}
+        self._started = False
+
+    def start(self) -> "Warmup":
+        if self._started:
+            return self
+        self._started = True
+        steps: Dict[str, Callable[[], Any]] = {
+            "llm": self._check_llm,
+            "embeddings": LLMManager.get_embeddings,
+            "vector_store": self._load_vector_store,
+        }
+        for name, step in steps.items():
+            threading.Thread(target=self._run, args=(name, step), name=f"warmup-{name}", daemon=True).start()
+        logger.info("Started background warm-up")
+        return self
+
+    @staticmethod
+    def _check_llm():
+        if not LLMManager.test_connection():
+            raise RuntimeError("Failed to connect to Ollama")
+
+    def _load_vector_store(self):
+        # Nothing saved yet is fine: the index starts empty
+        if self.vector_manager.storage.exists() and not self.vector_manager.load_vector_store():
+            self.errors["vector_store"] = "Failed to load the saved vector store, starting with an empty one"
+            logger.error(f"{self.errors['vector_store']} ({self.vector_manager.index_path})")
+
+    def _run(self, name: str, step: Callable[[], Any]):
+        self.status[name] = "running"
+        start = time.perf_counter()
+        try:
+            step()
+            self.status[name] = "ready"
+            logger.info(f"Warm-up of {name} done in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            self.status[name] = "failed"
+            self.errors[name] = str(e)
+            logger.error(f"Warm-up of {name} failed: {e}")
+        finally:
+            self.durations[name] = time.perf_counter() - start
+            self._events[name].set()
+
+    def wait(self, name: str, timeout: Optional[float] = None) -> bool:
+        """Wait for a component, returns whether it is ready (False if it failed or timed out)"""
+        self._events[name].wait(timeout)
+        return self.status[name] == "ready"
+
+    def is_ready(self, *names: str) -> bool:
+        return all(self.status[name] == "ready" for name in names or COMPONENTS)
+
+    def is_done(self) -> bool:
+        return all(event.is_set() for event in self._events.values())
+
+    def queries_ready(self) -> bool:
+        """Whether questions can be answered from the index"""
+        return self.is_ready("embeddings", "vector_store")
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {
+                "status": self.status[name],
+                "seconds": self.durations.get(name),
+                "error": self.errors.get(name),
+            }
+            for name in COMPONENTS
+        }